@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the CSV redaction: filter_datum on key=value lines
+against the column-positional redactor, on a synthetic users CSV
+Usage: ./bench_columns.py [rows]
+"""
+import csv
+import io
+import sys
+import time
+from typing import List
+from filtered_logger import (PII_FIELDS, RedactingFormatter,
+                             column_redactor, filter_datum, redact_rows)
+
+
+HEADER = ("name", "email", "phone", "ssn", "password", "ip", "last_login",
+          "user_agent")
+
+
+def synthetic_csv(rows: int) -> str:
+    """build a users CSV shaped like user_data.csv"""
+    out = io.StringIO()
+    writer = csv.writer(out, quoting=csv.QUOTE_ALL, lineterminator='\n')
+    writer.writerow(HEADER)
+    for i in range(rows):
+        writer.writerow(("User {}".format(i), "user{}@mail.com".format(i),
+                         "(473) 401-{:04d}".format(i % 10000),
+                         "261-72-{:04d}".format(i % 10000),
+                         "pwd{}".format(i),
+                         "10.0.{}.{}".format(i // 256 % 256, i % 256),
+                         "2019-11-14 06:14:24",
+                         "Mozilla/5.0 (X11; Linux x86_64)"))
+    return out.getvalue()
+
+
+def bench_filter_datum(data: str) -> float:
+    """redact each row rendered as key=value; with filter_datum"""
+    separator = RedactingFormatter.SEPARATOR
+    reader = csv.reader(io.StringIO(data))
+    header = next(reader)
+    start = time.perf_counter()
+    for row in reader:
+        message = ''.join('{}={}{}'.format(key, value, separator)
+                          for key, value in zip(header, row))
+        filter_datum(PII_FIELDS, RedactingFormatter.REDACTION, message,
+                     separator)
+    return time.perf_counter() - start
+
+
+def bench_columns(data: str, batch_size: int = 0) -> float:
+    """redact each row, or batch of rows, by column position"""
+    reader = csv.reader(io.StringIO(data))
+    redact = column_redactor(next(reader), PII_FIELDS,
+                             RedactingFormatter.REDACTION)
+    start = time.perf_counter()
+    if batch_size <= 0:
+        for row in reader:
+            redact(row)
+    else:
+        batch: List = []
+        for row in reader:
+            batch.append(row)
+            if len(batch) == batch_size:
+                redact_rows(redact, batch)
+                batch = []
+        redact_rows(redact, batch)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    data = synthetic_csv(rows)
+    results = [("filter_datum", bench_filter_datum(data)),
+               ("columns", bench_columns(data)),
+               ("columns, batches of 1000", bench_columns(data, 1000))]
+    baseline = results[0][1]
+    for name, elapsed in results:
+        print("{:<26} {:8.3f}s {:>12,.0f} rows/s  x{:.1f}".format(
+            name, elapsed, rows / elapsed, baseline / elapsed))
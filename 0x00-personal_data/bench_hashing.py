@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the batch password hashing: throughput of hash_passwords
+and are_valid for a growing number of thread and process workers
+Usage: ./bench_hashing.py [passwords] [max_workers]
+"""
+import os
+import sys
+import time
+from encrypt_password import are_valid, hash_passwords, make_executor
+
+
+def bench(passwords: list, workers: int, processes: bool) -> tuple:
+    """hashes then checks `passwords`, return both throughputs"""
+    with make_executor(workers, processes) as executor:
+        start = time.perf_counter()
+        hashed = hash_passwords(passwords, executor)
+        hashing = time.perf_counter() - start
+
+        start = time.perf_counter()
+        assert all(are_valid(hashed, passwords, executor))
+        checking = time.perf_counter() - start
+    return len(passwords) / hashing, len(passwords) / checking
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    passwords = ["MyAmazingPassw0rd{}".format(i) for i in range(count)]
+
+    workers = 1
+    print("{:<8} {:>7} {:>12} {:>12}".format("pool", "workers",
+                                             "hash/s", "check/s"))
+    while workers <= max_workers:
+        for processes in (False, True):
+            hashing, checking = bench(passwords, workers, processes)
+            print("{:<8} {:>7} {:>12.1f} {:>12.1f}".format(
+                "process" if processes else "thread", workers,
+                hashing, checking))
+        workers *= 2
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite of the PII logging pipeline
+Measures filter_datum, RedactingFormatter.format and a get_logger logger
+in records per second and the peak bytes allocated by one record, while
+varying the number of fields, the message length, the separator and the
+share of PII keys in the message
+Usage: ./bench_logging.py [-o results.json] [-c baseline.json] [-n records]
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+from filtered_logger import RedactingFormatter, filter_datum, get_logger
+
+
+FIELD_COUNTS = (5, 20, 100)
+MESSAGE_LENGTHS = (100, 1000, 10000)
+SEPARATORS = (";", "|")
+PII_SHARES = (0.0, 0.25, 1.0)
+
+
+def make_case(fields: int, length: int, separator: str,
+              pii_share: float) -> Tuple[List[str], str]:
+    """
+    Build the PII fields and a message for one case
+
+        Return:
+            the PII field names and a message of about `length`
+            characters made of `fields` keys, `pii_share` of them PII
+    """
+    keys = ["field{}".format(i) for i in range(fields)]
+    pii = keys[:round(fields * pii_share)] or ["absent"]
+    value_length = max(1, length // fields - len("field00=;"))
+    message = ''.join('{}={}{}'.format(key, 'v' * value_length, separator)
+                      for key in keys)
+    return pii, message
+
+
+def measure(run: Callable[[], object], records: int) -> Dict[str, float]:
+    """time `records` calls of `run`, then trace their allocations"""
+    run()
+    start = time.perf_counter()
+    for _ in range(records):
+        run()
+    elapsed = time.perf_counter() - start
+
+    # the highest peak of a single call, over a tenth of the records
+    peak = 0
+    tracemalloc.start()
+    for _ in range(max(1, records // 10)):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return {"records_per_s": records / elapsed, "peak_bytes": peak}
+
+
+def run_suite(records: int) -> List[Dict]:
+    """
+    run every target on every case
+    The formatter and the logger only use RedactingFormatter.SEPARATOR,
+    so they are skipped for the other separators
+    """
+    logger = get_logger()
+    devnull = open(os.devnull, 'w')
+    for handler in logger.handlers:
+        handler.setStream(devnull)
+
+    results = []
+    for fields, length, separator, pii_share in itertools.product(
+            FIELD_COUNTS, MESSAGE_LENGTHS, SEPARATORS, PII_SHARES):
+        pii, message = make_case(fields, length, separator, pii_share)
+        formatter = RedactingFormatter(fields=pii)
+        for handler in logger.handlers:
+            handler.setFormatter(formatter)
+        record = logging.LogRecord("bench", logging.INFO, None, None,
+                                   message, None, None)
+        targets: Dict[str, Callable[[], object]] = {
+            "filter_datum": lambda: filter_datum(pii, "***", message,
+                                                 separator),
+            "RedactingFormatter.format": lambda: formatter.format(record),
+            "get_logger": lambda: logger.info(message),
+        }
+        for target, run in targets.items():
+            if target != "filter_datum" and \
+                    separator != RedactingFormatter.SEPARATOR:
+                continue
+            result = {"target": target, "fields": fields,
+                      "length": len(message), "separator": separator,
+                      "pii_share": pii_share}
+            result.update(measure(run, records))
+            results.append(result)
+            print("{target:<26} fields={fields:<4} length={length:<6} "
+                  "sep={separator} pii={pii_share:<5} "
+                  "{records_per_s:>12,.0f} rec/s "
+                  "{peak_bytes:>8,} B".format(**result))
+    return results
+
+
+def revision() -> str:
+    """current git revision, if any"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: List[Dict], baseline_path: str):
+    """print the speedup of each case against a previous results file"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    def key(result):
+        return tuple(result[k] for k in ("target", "fields", "length",
+                                         "separator", "pii_share"))
+
+    previous = {key(result): result for result in baseline["results"]}
+    print("\ncompared with {}".format(baseline["revision"]))
+    for result in results:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        speedup = result["records_per_s"] / old["records_per_s"]
+        print("{:<26} fields={:<4} length={:<6} sep={} pii={:<5} "
+              "x{:.2f}".format(result["target"], result["fields"],
+                               result["length"], result["separator"],
+                               result["pii_share"], speedup))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('-n', '--records', type=int, default=10000)
+    parser.add_argument('-o', '--output', default="bench_logging.json",
+                        help="machine-readable results")
+    parser.add_argument('-c', '--compare', help="previous results file")
+    args = parser.parse_args()
+
+    results = run_suite(args.records)
+    with open(args.output, 'w') as f:
+        json.dump({"revision": revision(),
+                   "python": platform.python_version(),
+                   "records": args.records,
+                   "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Consistency checks of the redaction paths against filter_datum
+Fails on the first output that differs, or when a long token makes the
+key lookup slow
+Usage: ./check_redaction.py [lines]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from filtered_logger import ALTERNATION_LIMIT, PII_FIELDS, filter_datum
+from redact_file import redact_file
+
+
+KEYS = PII_FIELDS + ("ip", "user_agent", "username", "event")
+ABSENT = tuple("absent{}".format(i) for i in range(ALTERNATION_LIMIT + 1))
+LONG_TOKEN = 100000
+LONG_TOKEN_SECONDS = 0.05
+
+
+def random_line(separator: str) -> str:
+    """a key=value line, not always ended by the separator"""
+    line = separator.join("{}={}".format(random.choice(KEYS),
+                                         random.choice(("abc", "x@y",
+                                                        "1.1.1.1")))
+                          for _ in range(random.randint(1, 6)))
+    return line + random.choice((separator, ""))
+
+
+def free_text_line(separator: str) -> str:
+    """a line mixing free text, key=value pairs and keys inside values"""
+    words = ("event=reset", "User login", " ", "username", "x=",
+             "=", "password", "name", "email", "note", "hunter2", "a@b")
+    return ''.join(random.choice(words + ("=", separator, " "))
+                   for _ in range(random.randint(1, 12)))
+
+
+def check_engines(lines: int, separator: str = ";"):
+    """the alternation and the key lookup redact the same keys"""
+    for _ in range(lines):
+        line = free_text_line(separator)
+        alternation = filter_datum(PII_FIELDS, "***", line, separator)
+        lookup = filter_datum(PII_FIELDS + ABSENT, "***", line, separator)
+        if alternation != lookup:
+            raise AssertionError("{!r}: {!r} != {!r}".format(
+                line, alternation, lookup))
+
+
+def check_long_tokens(separator: str = ";"):
+    """
+    tokens of LONG_TOKEN characters, in a value and in free text, are
+    redacted as by the alternation and in linear time by the key lookup
+    """
+    token = 'v' * LONG_TOKEN
+    for line in ("ip={0}{1}name=bob{1}".format(token, separator),
+                 "{0} {0}= name=bob{1}{0}".format(token, separator)):
+        alternation = filter_datum(PII_FIELDS, "***", line, separator)
+        start = time.perf_counter()
+        lookup = filter_datum(PII_FIELDS + ABSENT, "***", line, separator)
+        elapsed = time.perf_counter() - start
+        if alternation != lookup:
+            raise AssertionError("long token: engines differ")
+        if elapsed > LONG_TOKEN_SECONDS:
+            raise AssertionError("long token: key lookup took {:.3f}s"
+                                 .format(elapsed))
+
+
+def check_file(lines: int, separator: str = ";"):
+    """redact_file matches filter_datum run on each line"""
+    text = ''.join(random_line(separator) + "\n" for _ in range(lines))
+    text += "ip=1.1.1.1;password=abc\nname=bob;email=x@y;ip=2.2.2.2;\n"
+    expected = ''.join(filter_datum(PII_FIELDS, "***", line, separator)
+                       + "\n" for line in text.splitlines())
+    with tempfile.NamedTemporaryFile('w', delete=False) as f:
+        f.write(text)
+    try:
+        with ThreadPoolExecutor(2) as executor:
+            result = b''.join(redact_file(f.name, PII_FIELDS, "***",
+                                          separator, executor,
+                                          chunk_size=4096)).decode()
+    finally:
+        os.remove(f.name)
+    if result != expected:
+        raise AssertionError("redact_file differs from filter_datum")
+
+
+def check_csv():
+    """redact_file --csv redacts by column and keeps ragged rows whole"""
+    text = ("name,ip,email\n"
+            "bob,1.1.1.1,b@x\n"
+            "ann,2.2.2.2,a@x,extra,more\n"
+            "eve\n")
+    expected = ("name,ip,email\n"
+                "***,1.1.1.1,***\n"
+                "***,2.2.2.2,***,extra,more\n"
+                "***\n")
+    with tempfile.NamedTemporaryFile('w', delete=False) as f:
+        f.write(text)
+    try:
+        with ThreadPoolExecutor(2) as executor:
+            result = b''.join(redact_file(f.name, PII_FIELDS, "***", ",",
+                                          executor, is_csv=True)).decode()
+    finally:
+        os.remove(f.name)
+    if result != expected:
+        raise AssertionError("redact_file --csv: {!r}".format(result))
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    check_file(count)
+    check_csv()
+    check_engines(count)
+    check_long_tokens()
+    print("OK")
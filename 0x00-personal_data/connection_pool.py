@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Pool of DB-API connections
+"""
+import queue
+import threading
+import weakref
+from typing import Any, Callable
+
+
+class PooledConnection():
+    """
+    Connection checked out of a ConnectionPool
+
+    Every attribute is forwarded to the underlying connection, except
+    close() which hands the connection back to its pool.
+    It can be used as a context manager, the connection is handed back
+    on exit. A PooledConnection garbage-collected without close() hands
+    its connection back too, so a leak does not hold a slot forever.
+    """
+
+    def __init__(self, pool: 'ConnectionPool', connection: Any):
+        """initialization"""
+        self._connection = connection
+        # no reference to self: the finalizer runs once, on close() or
+        # when self is collected, whichever comes first
+        self._release = weakref.finalize(self, pool.release, connection)
+        self._release.atexit = False
+
+    def __getattr__(self, name: str) -> Any:
+        """forward to the underlying connection"""
+        if self._connection is None:
+            raise AttributeError("connection already returned to its pool")
+        return getattr(self._connection, name)
+
+    def close(self):
+        """hand the connection back to its pool, only the first time"""
+        self._connection = None
+        self._release()
+
+    def __enter__(self) -> 'PooledConnection':
+        """context manager entry"""
+        return self
+
+    def __exit__(self, *exc_info):
+        """context manager exit: hand the connection back"""
+        self.close()
+
+
+class ConnectionPool():
+    """
+    Pool of DB-API connections
+
+    Args:
+        factory: callable opening a new DB-API connection
+                 lambda: sqlite3.connect(path, check_same_thread=False)
+        size: maximum number of connections open at the same time
+        timeout: seconds to wait for a free connection, None waits forever
+
+    Idle connections are reused last-in first-out and health-checked on
+    checkout; a connection failing the check is closed and replaced.
+    Once the pool is closed, connections handed back are closed too.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 5,
+                 timeout: float = None):
+        """initialization"""
+        self.factory = factory
+        self.size = size
+        self.timeout = timeout
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.closed = False
+
+    def connect(self) -> PooledConnection:
+        """check a connection out of the pool"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("no free connection in the pool")
+        try:
+            while True:
+                try:
+                    connection = self._idle.get_nowait()
+                except queue.Empty:
+                    connection = self.factory()
+                    break
+                if self.is_alive(connection):
+                    break
+                self._discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+        return PooledConnection(self, connection)
+
+    def release(self, connection: Any):
+        """take back a connection, rolling back what it left uncommitted"""
+        try:
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+        else:
+            self._idle.put(connection)
+            if self.closed:
+                # close() may have emptied the queue before the put
+                self.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """close every idle connection, then each one handed back"""
+        self.closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    @staticmethod
+    def is_alive(connection: Any) -> bool:
+        """health check: ping the server, or run a trivial query"""
+        try:
+            if hasattr(connection, 'ping'):
+                connection.ping()
+            else:
+                cursor = connection.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def _discard(connection: Any):
+        """close a connection, ignoring errors"""
+        try:
+            connection.close()
+        except Exception:
+            pass
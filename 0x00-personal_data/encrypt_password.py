@@ -3,6 +3,15 @@
 Encrypting Passwords
 """
 import bcrypt
+import os
+import threading
+from concurrent.futures import (Executor, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Iterable, List
+
+
+_executor: Executor = None
+_executor_lock = threading.Lock()
 
 
 def hash_password(password: str) -> bytes:
@@ -36,3 +45,97 @@ def is_valid(hashed_password: bytes, password: str) -> bool:
         True if valid else False
     """
     return bcrypt.checkpw(password.encode('utf-8'), hashed_password)
+
+
+def make_executor(max_workers: int = None,
+                  processes: bool = False) -> Executor:
+    """
+    Create an executor for the batch hashing functions
+
+    Args:
+        max_workers: number of workers, defaults to the number of CPUs
+        processes: use a process pool instead of a thread pool
+
+    Returns:
+        Executor: the new executor, to be shut down by the caller
+    """
+    if processes:
+        return ProcessPoolExecutor(max_workers=max_workers)
+    return ThreadPoolExecutor(max_workers=max_workers or os.cpu_count())
+
+
+def _default_executor() -> Executor:
+    """Shared thread pool of the future-returning functions"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = make_executor()
+    return _executor
+
+
+def hash_passwords(passwords: Iterable[str],
+                   executor: Executor = None) -> List[bytes]:
+    """
+    Hashes many passwords in parallel
+
+    Args:
+        passwords: the passwords to hash
+        executor: executor running the hashes, see make_executor,
+                  defaults to a shared thread pool
+
+    Returns:
+        List[bytes]: the hashed passwords, in the order of `passwords`
+    """
+    executor = executor or _default_executor()
+    return list(executor.map(hash_password, passwords))
+
+
+def are_valid(hashed_passwords: Iterable[bytes], passwords: Iterable[str],
+              executor: Executor = None) -> List[bool]:
+    """
+    Check many passwords in parallel
+
+    Args:
+        hashed_passwords: the hashed passwords
+        passwords: the passwords to check, paired with hashed_passwords
+        executor: executor running the checks, see make_executor,
+                  defaults to a shared thread pool
+
+    Returns:
+        List[bool]: the validity of each password
+    """
+    executor = executor or _default_executor()
+    return list(executor.map(is_valid, hashed_passwords, passwords))
+
+
+def hash_password_async(password: str, executor: Executor = None) -> Future:
+    """
+    Hashes a password without blocking
+
+    Args:
+        password: the password to hash
+        executor: executor running the hash, defaults to a shared
+                  thread pool
+
+    Returns:
+        Future: resolves to the hashed password
+    """
+    return (executor or _default_executor()).submit(hash_password, password)
+
+
+def is_valid_async(hashed_password: bytes, password: str,
+                   executor: Executor = None) -> Future:
+    """
+    Check password validity without blocking
+
+    Args:
+        hashed_password: the hashed password
+        password: the password to check
+        executor: executor running the check, defaults to a shared
+                  thread pool
+
+    Returns:
+        Future: resolves to True if valid else False
+    """
+    return (executor or _default_executor()).submit(is_valid,
+                                                    hashed_password, password)
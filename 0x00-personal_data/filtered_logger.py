@@ -4,18 +4,30 @@ Obfuscate log message with regex
 Log formatter
 Create Logger
 """
+import atexit
+import copy
 import os
 import mysql.connector
-from typing import List, Tuple
+import threading
+from connection_pool import ConnectionPool, PooledConnection
+from collections.abc import Mapping
+from functools import lru_cache, partial
+from typing import Any, Callable, List, Optional, Sequence, Tuple
 import re
 import logging
+import logging.handlers
+import queue
 
 
 PII_FIELDS: Tuple = ("name", "email", "phone", "ssn", "password")
+BATCH_SIZE: int = int(os.getenv('PERSONAL_DATA_BATCH_SIZE', 1000))
+ALTERNATION_LIMIT: int = 16
+DB_POOL: ConnectionPool = None
+_db_pool_lock = threading.RLock()
 
 
-def get_db() -> mysql.connector.connection.MySQLConnection:
-    """returns a connector to the mysql database"""
+def connect_db() -> mysql.connector.connection.MySQLConnection:
+    """opens a new connection to the mysql database"""
     username = os.getenv('PERSONAL_DATA_DB_USERNAME', 'root')
     password = os.getenv('PERSONAL_DATA_DB_PASSWORD', '')
     host = os.getenv('PERSONAL_DATA_DB_HOST', 'localhost')
@@ -30,8 +42,50 @@ def get_db() -> mysql.connector.connection.MySQLConnection:
     return mydb
 
 
+def init_db_pool(factory: Callable[[], Any] = connect_db,
+                 size: int = None, timeout: float = None) -> ConnectionPool:
+    """
+    (Re)configure the pool of connections used by get_db
+
+        Args:
+            factory: callable opening a new DB-API connection
+            size: maximum number of connections, defaults to
+                  PERSONAL_DATA_DB_POOL_SIZE or 5
+            timeout: seconds get_db waits for a free connection before
+                     raising TimeoutError, defaults to
+                     PERSONAL_DATA_DB_POOL_TIMEOUT or 30
+        Return:
+            the new pool
+    """
+    global DB_POOL
+    if size is None:
+        size = int(os.getenv('PERSONAL_DATA_DB_POOL_SIZE', 5))
+    if timeout is None:
+        timeout = float(os.getenv('PERSONAL_DATA_DB_POOL_TIMEOUT', 30))
+    pool = ConnectionPool(factory, size, timeout)
+    with _db_pool_lock:
+        previous, DB_POOL = DB_POOL, pool
+    if previous is not None:
+        previous.close()
+    return pool
+
+
+def get_db() -> PooledConnection:
+    """
+    returns a connector to the mysql database, checked out of the pool
+    close() or leaving a `with` block hands it back to the pool
+    Raises TimeoutError when no connection frees up in time, see
+    init_db_pool
+    """
+    with _db_pool_lock:
+        if DB_POOL is None:
+            init_db_pool()
+        pool = DB_POOL
+    return pool.connect()
+
+
 def filter_datum(fields: List[str], redaction: str, message: str,
-                 separator: str) -> str:
+                 separator: str, exact: bool = False) -> str:
     """
     Filter and obfuscate the string
 
@@ -47,19 +101,125 @@ def filter_datum(fields: List[str], redaction: str, message: str,
             separator: a string representing by which character is
                     separating all fields in the log line (message)
                     ";"
+            exact: only obfuscate keys equal to a field, so that "name"
+                   leaves "username=" untouched
         Return:
             String with string obfuscated
     """
-    for item in fields:
-        message = re.sub(rf'{item}=[^{separator}]+', f'{item}={redaction}',
-                         message)
-    return message
+    return redaction_engine(tuple(fields), separator, redaction,
+                            exact)(message)
+
+
+@lru_cache(maxsize=128)
+def redaction_engine(fields: Tuple[str, ...], separator: str,
+                     redaction: str,
+                     exact: bool = False) -> Callable[[str], str]:
+    """
+    Compile the redaction of `fields` into a single pass substitution
+
+        Args:
+            fields: a tuple of the field names to obfuscate
+            redaction: the string replacing each field value
+            separator: the character(s) separating fields in a log line
+            exact: only obfuscate keys equal to a field
+        Return:
+            a callable taking a log line and returning it obfuscated.
+            Engines are cached per (fields, separator, redaction, exact),
+            so the pattern is only compiled once.
+            A few fields are matched by an alternation; past
+            ALTERNATION_LIMIT fields, or for exact matching, each key of
+            the line is looked up in a set instead, so the cost depends
+            on the length of the line and not on the number of fields.
+    """
+    if not fields:
+        return str
+    sep = re.escape(separator)
+    if not exact and len(fields) <= ALTERNATION_LIMIT:
+        pattern = re.compile('({})=[^{}]+'.format(
+            '|'.join(re.escape(field) for field in fields), sep))
+        template = r'\1=' + redaction.replace('\\', r'\\')
+        return partial(pattern.sub, template)
+
+    keys = frozenset(fields)
+    lengths = sorted(set(len(field) for field in fields))
+    # a key starts after a delimiter only: a search restarting inside a
+    # long token would make the scan quadratic in the token length
+    key_pattern = re.compile(
+        r'(?<![^\s{0}=])([^\s{0}=]+)=(?=[^{0}])'.format(sep))
+    value_pattern = re.compile('[^{}]+'.format(sep))
 
+    def redact(message: str) -> str:
+        """
+        obfuscate the value of each key that is, or ends with, a field
+        Keys are searched anywhere, also in free text and in the values
+        of other keys, as the alternation does
+        """
+        parts, pos = [], 0
+        while True:
+            match = key_pattern.search(message, pos)
+            if match is None:
+                parts.append(message[pos:])
+                return ''.join(parts)
+            key = match.group(1)
+            parts.append(message[pos:match.end()])
+            pos = match.end()
+            if key in keys or not exact and any(
+                    key[-length:] in keys for length in lengths
+                    if length < len(key)):
+                parts.append(redaction)
+                pos = value_pattern.match(message, pos).end()
+    return redact
 
-def get_logger() -> logging.Logger:
+
+def column_redactor(header: Sequence[str], fields: List[str],
+                    redaction: str) -> Callable[[Sequence], List]:
+    """
+    Resolve the fields to obfuscate to column positions
+
+        Args:
+            header: the column names of the rows
+                    ("name", "email", "phone", "ssn", "password", "ip")
+            fields: a list of strings representing all fields to obfuscate
+            redaction: a string representing by what the
+                       field will be obfuscated
+        Return:
+            a callable taking a row and returning it as a list with the
+            columns of `fields` obfuscated, no matching is done per row.
+            Columns of a row past the header have no name: they are
+            kept as they are, as are rows shorter than the header.
+    """
+    pii = frozenset(fields)
+    mask = tuple(column in pii for column in header)
+    width = len(mask)
+
+    def redact(row: Sequence) -> List:
+        """obfuscate the PII columns of a row"""
+        result = [redaction if hidden else value
+                  for value, hidden in zip(row, mask)]
+        if len(row) > width:
+            result.extend(row[width:])
+        return result
+    return redact
+
+
+def redact_rows(redact: Callable[[Sequence], List],
+                rows: Sequence[Sequence]) -> List[List]:
+    """apply a column redactor to a batch of rows"""
+    return list(map(redact, rows))
+
+
+def get_logger(queued: bool = False, queue_size: int = 10000,
+               block: bool = False, cache_size: int = 0) -> logging.Logger:
     """
     Create logger
-    Args: None
+    Args:
+        queued: hand records to a background listener thread which does
+                the redaction, the formatting and the write to stderr
+        queue_size: maximum number of records waiting in the queue
+        block: when the queue is full, wait for room instead of
+               dropping the record
+        cache_size: capacity of the LRU cache of redacted messages,
+                    0 disables it
     Return: a logging.Logger object
     """
     logger = logging.getLogger('user_data')
@@ -67,12 +227,70 @@ def get_logger() -> logging.Logger:
     logger.propagate = False
 
     stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(RedactingFormatter(fields=PII_FIELDS))
-    logger.addHandler(stream_handler)
+    stream_handler.setFormatter(RedactingFormatter(fields=PII_FIELDS,
+                                                   cache_size=cache_size))
+    if not queued:
+        logger.addHandler(stream_handler)
+        return logger
+
+    records: queue.Queue = queue.Queue(maxsize=queue_size)
+    queue_handler = BoundedQueueHandler(records, block=block)
+    listener = BoundedQueueListener(records, stream_handler)
+    queue_handler.listener = listener
+    logger.addHandler(queue_handler)
+    listener.start()
+    atexit.register(listener.stop)
 
     return logger
 
 
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler for a bounded queue
+
+    Records are put on the queue as they are: the redaction and the
+    formatting are left to the handlers of the listener.
+    When the queue is full, the record is either dropped and counted in
+    `dropped`, or the logging thread waits for room if `block` is set.
+    """
+
+    def __init__(self, records: queue.Queue, block: bool = False):
+        """initialization"""
+        super(BoundedQueueHandler, self).__init__(records)
+        self.block = block
+        self.dropped = 0
+        self.listener = None
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """shallow copy of the record, left unformatted"""
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord):
+        """put the record on the queue, dropping it if the queue is full"""
+        try:
+            self.queue.put(record, block=self.block)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BoundedQueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener flushing its handlers when stopped
+    """
+
+    def enqueue_sentinel(self):
+        """wait for room for the sentinel, even on a full queue"""
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        """process the records left in the queue, then flush the handlers"""
+        if self._thread is None:
+            return
+        super(BoundedQueueListener, self).stop()
+        for handler in self.handlers:
+            handler.flush()
+
+
 class RedactingFormatter(logging.Formatter):
 
     """
@@ -82,38 +300,101 @@ class RedactingFormatter(logging.Formatter):
         format: overrides the format method in the logging.Formatter class.
                 It modifies the log message by applying a redaction filter
                 before formatting it.
+        redact_message: returns the redacted message of a record.
+                Structured records, logged as a mapping or with a mapping
+                as argument, are redacted by key before being rendered.
+        cache_info: hits, misses, maxsize and currsize of the cache of
+                redacted messages, None when the cache is disabled.
     """
 
     REDACTION = "***"
     FORMAT = "[HOLBERTON] %(name)s %(levelname)s %(asctime)-15s: %(message)s"
     SEPARATOR = ";"
 
-    def __init__(self, fields: List[str]):
-        """iniitialization"""
+    def __init__(self, fields: List[str], exact: bool = False,
+                 cache_size: int = 0):
+        """
+        iniitialization
+
+            Args:
+                fields: the fields to obfuscate
+                exact: only obfuscate keys equal to a field
+                cache_size: number of redacted messages kept in a LRU
+                            cache keyed on the raw message, 0 disables it
+        """
         self.fields = fields
+        self._pii = frozenset(fields)
+        self._redact = redaction_engine(tuple(fields), self.SEPARATOR,
+                                        self.REDACTION, exact)
+        if cache_size > 0:
+            self._redact = lru_cache(maxsize=cache_size)(self._redact)
         super(RedactingFormatter, self).__init__(self.FORMAT)
 
+    def cache_info(self) -> Optional[Tuple[int, int, int, int]]:
+        """statistics of the cache of redacted messages"""
+        if not hasattr(self._redact, 'cache_info'):
+            return None
+        return self._redact.cache_info()
+
     def format(self, record: logging.LogRecord) -> str:
-        """overrides the format method in the logging.Formatter class"""
-        record.msg = filter_datum(self.fields, self.REDACTION,
-                                  record.getMessage(), self.SEPARATOR)
-        return (super(RedactingFormatter, self).format(record))
+        """overrides the format method in the logging.Formatter class
+        The redaction is applied on a copy of the record, so the record
+        seen by other handlers keeps its original message
+        """
+        redacted = logging.makeLogRecord(record.__dict__)
+        redacted.msg = self.redact_message(record)
+        redacted.args = None
+        return (super(RedactingFormatter, self).format(redacted))
+
+    def redact_message(self, record: logging.LogRecord) -> str:
+        """
+        Build the redacted message of a record
+
+            Args:
+                record: the log record
+                    logger.info({"name": "bob", "ip": "::1"})
+                    logger.info("ip=%(ip)s;name=%(name)s;", {...})
+            Return:
+                the message with the values of every field obfuscated.
+                Mappings are masked by key lookup, so only plain string
+                messages go through the regex engine.
+        """
+        if isinstance(record.msg, Mapping):
+            return ''.join('{}={}{}'.format(key, value, self.SEPARATOR)
+                           for key, value in self._mask(record.msg).items())
+        if isinstance(record.args, Mapping):
+            return str(record.msg) % self._mask(record.args)
+        return self._redact(record.getMessage())
 
+    def _mask(self, data: Mapping) -> dict:
+        """replace the values of the PII keys of `data` by the redaction"""
+        return {key: self.REDACTION if key in self._pii else value
+                for key, value in data.items()}
 
-def main():
-    """Entry Point"""
-    db: mysql.connector.connection.MySQLConnection = get_db()
-    cursor = db.cursor()
+
+def main(batch_size: int = BATCH_SIZE):
+    """
+    Entry Point
+    Stream the users table through the redacting logger
+
+    Rows are fetched in batches but logged one record each: a record is
+    one line with its own prefix, the formatter redacts a mapping by
+    key, and a full queue drops one row rather than a whole batch.
+
+        Args:
+            batch_size: number of rows fetched from the server at a time
+    """
+    db: PooledConnection = get_db()
+    cursor = db.cursor(buffered=False)
     cursor.execute("SELECT name, email, phone, ssn, password FROM users;")
-    headers: Tuple = (head[0] for head in cursor.description)
+    headers: Tuple = tuple(head[0] for head in cursor.description)
     logger: logging.Logger = get_logger()
 
-    for row in cursor:
-        data_row: str = ''
-        for key, value in zip(headers, row):
-            data_row = ''.join(f'{key}={str(value)};')
-
-        logger.info(data_row)
+    rows: List[Tuple] = cursor.fetchmany(batch_size)
+    while rows:
+        for row in rows:
+            logger.info(dict(zip(headers, row)))
+        rows = cursor.fetchmany(batch_size)
 
     cursor.close()
     db.close()
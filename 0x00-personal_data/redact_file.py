@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Redact a large log or CSV file offline
+The file is memory-mapped, split into line-aligned chunks and the chunks
+are redacted in a process pool, then written back in their original order
+"""
+import argparse
+import csv
+import io
+import mmap
+import os
+import sys
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterator, List, Tuple
+from filtered_logger import (PII_FIELDS, RedactingFormatter,
+                             column_redactor, redaction_engine)
+
+
+CHUNK_SIZE: int = 16 * 1024 * 1024
+
+
+def chunk_bounds(file_path: str, chunk_size: int = CHUNK_SIZE,
+                 offset: int = 0) -> List[Tuple[int, int]]:
+    """
+    Split a file into line-aligned chunks
+
+        Args:
+            file_path: path of the file to split
+            chunk_size: minimum size of a chunk in bytes, a chunk is
+                        extended up to the end of its last line
+            offset: byte offset where the first chunk starts
+        Return:
+            list of (start, end) byte offsets covering the file from offset
+    """
+    bounds: List[Tuple[int, int]] = []
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return bounds
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = offset
+            while start < size:
+                end = mm.find(b'\n', start + chunk_size - 1)
+                end = size if end == -1 else end + 1
+                bounds.append((start, end))
+                start = end
+    return bounds
+
+
+def redact_chunk(file_path: str, start: int, end: int,
+                 fields: Tuple[str, ...], redaction: str,
+                 separator: str, header: Tuple[str, ...] = None) -> bytes:
+    """
+    Redact one chunk of a file, same semantics as filter_datum on
+    each line
+
+        Args:
+            file_path: path of the file
+            start, end: byte offsets of the chunk
+            fields, redaction, separator: see filter_datum
+            header: column names when the chunk holds CSV rows, the
+                    fields are then obfuscated by column position
+        Return:
+            the redacted chunk
+    """
+    with open(file_path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            text = mm[start:end].decode('utf-8', 'surrogateescape')
+    if header is None:
+        # line by line: a value must not run on into the next line
+        redact = redaction_engine(fields, separator, redaction)
+        text = '\n'.join(map(redact, text.split('\n')))
+    else:
+        out = io.StringIO()
+        csv.writer(out, lineterminator='\n').writerows(
+            map(column_redactor(header, fields, redaction),
+                csv.reader(io.StringIO(text))))
+        text = out.getvalue()
+    return text.encode('utf-8', 'surrogateescape')
+
+
+def redact_file(file_path: str, fields: Tuple[str, ...], redaction: str,
+                separator: str, executor: Executor,
+                chunk_size: int = CHUNK_SIZE, window: int = 8,
+                is_csv: bool = False) -> Iterator[bytes]:
+    """
+    Redact a file chunk by chunk on an executor
+
+        Args:
+            file_path: path of the file to redact
+            fields, redaction, separator: see filter_datum
+            executor: executor running `redact_chunk`
+            chunk_size: minimum size of a chunk in bytes
+            window: maximum number of chunks in flight, which bounds
+                    the memory held by pending results
+            is_csv: the file is a CSV file whose first line is the header,
+                    the header is copied as is and the rows are redacted
+                    by column position
+        Return:
+            an iterator over the redacted chunks, in file order
+    """
+    header, offset = None, 0
+    if is_csv:
+        with open(file_path, 'rb') as f:
+            line = f.readline()
+        header = tuple(next(csv.reader([line.decode('utf-8')]), ()))
+        offset = len(line)
+        yield line
+
+    pending: deque = deque()
+    for start, end in chunk_bounds(file_path, chunk_size, offset):
+        pending.append(executor.submit(redact_chunk, file_path, start, end,
+                                       fields, redaction, separator,
+                                       header))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def main(argv: List[str] = None) -> int:
+    """Entry Point"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('input', help="file to redact")
+    parser.add_argument('output', help="redacted file, '-' for stdout")
+    parser.add_argument('-f', '--fields', default=','.join(PII_FIELDS),
+                        help="comma separated fields to obfuscate")
+    parser.add_argument('-r', '--redaction',
+                        default=RedactingFormatter.REDACTION)
+    parser.add_argument('-s', '--separator',
+                        default=RedactingFormatter.SEPARATOR)
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help="number of worker processes")
+    parser.add_argument('-c', '--chunk-size', type=int, default=CHUNK_SIZE,
+                        help="minimum chunk size in bytes")
+    parser.add_argument('--csv', action='store_true',
+                        help="redact a CSV file by column, using its header")
+    args = parser.parse_args(argv)
+
+    fields = tuple(field for field in args.fields.split(',') if field)
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        chunks = redact_file(args.input, fields, args.redaction,
+                             args.separator, executor, args.chunk_size,
+                             window=2 * args.jobs, is_csv=args.csv)
+        if args.output == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        else:
+            with open(args.output, 'wb') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
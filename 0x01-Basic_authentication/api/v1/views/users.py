@@ -2,18 +2,88 @@
 """ Module of Users views
 """
 from api.v1.views import app_views
-from flask import abort, jsonify, request
+from flask import abort, jsonify, request, Response
 from models.user import User
+from typing import Iterator, List
+
+
+PAGE_SIZE = 1000
+
+
+def users_page(after: str = None, limit: int = PAGE_SIZE) -> List[User]:
+    """ Users ordered by ID, `limit` at most, after the ID `after`
+    """
+    ranges = {} if after is None else {'id': (after, None)}
+    page = User.search(ranges=ranges, order_by='id', limit=limit + 1)
+    if page and page[0].id == after:
+        page = page[1:]
+    return page[:limit]
+
+
+def iter_users(after: str = None,
+               batch_size: int = PAGE_SIZE) -> Iterator[User]:
+    """ Users ordered by ID after the ID `after`, read page by page
+    """
+    while True:
+        page = users_page(after, batch_size)
+        yield from page
+        if len(page) < batch_size:
+            return
+        after = page[-1].id
+
+
+def json_array(users: Iterator[User]) -> Iterator[str]:
+    """ Encode users as a JSON array, one user at a time
+    """
+    yield '['
+    separator = ''
+    for user in users:
+        yield separator + user.to_json_string()
+        separator = ', '
+    yield ']'
 
 
 @app_views.route('/users', methods=['GET'], strict_slashes=False)
 def view_all_users() -> str:
     """ GET /api/v1/users
+    Query parameters (optional):
+      - limit: maximum number of users returned
+      - after: ID of the last user of the previous page
+      - format: `ndjson` or `json` to stream all users after `after`,
+                one per line or as a JSON array
     Return:
       - list of all User objects JSON represented
+      - with `limit` or `after`, a page of the User objects ordered by ID,
+        and a `Link` header to the next page if there is one
+      - 400 if limit isn't a positive integer
     """
-    all_users = [user.to_json() for user in User.all()]
-    return jsonify(all_users)
+    after = request.args.get('after')
+    stream_format = request.args.get('format')
+    if stream_format == 'ndjson':
+        return Response((user.to_json_string() + '\n'
+                         for user in iter_users(after)),
+                        mimetype='application/x-ndjson')
+    if stream_format == 'json':
+        return Response(json_array(iter_users(after)),
+                        mimetype='application/json')
+
+    limit = request.args.get('limit')
+    if limit is None and after is None:
+        all_users = [user.to_json() for user in User.all()]
+        return jsonify(all_users)
+    try:
+        limit = int(limit or PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError(limit)
+    except ValueError:
+        return jsonify({'error': "limit must be a positive integer"}), 400
+
+    page = users_page(after, limit + 1)
+    response = jsonify([user.to_json() for user in page[:limit]])
+    if len(page) > limit:
+        response.headers['Link'] = '<{}?limit={}&after={}>; rel="next"'.format(
+            request.base_url, limit, page[limit - 1].id)
+    return response
 
 
 @app_views.route('/users/<user_id>', methods=['GET'], strict_slashes=False)
@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+""" Models of the API
+STORAGE_TYPE=sqlite stores them in the SQLite database STORAGE_PATH
+instead of JSON files, SNAPSHOT_FORMAT=binary saves the files in the
+binary snapshot format
+"""
+from os import getenv
+from models.base import Base
+from models.storage import SQLiteStorage
+
+
+if getenv('STORAGE_TYPE') == 'sqlite':
+    Base.STORAGE = SQLiteStorage(getenv('STORAGE_PATH', '.db.sqlite3'))
+Base.SNAPSHOT_FORMAT = getenv('SNAPSHOT_FORMAT', Base.SNAPSHOT_FORMAT)
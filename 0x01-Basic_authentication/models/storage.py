@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+""" Storage backends of Base
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Iterable, List, Tuple, TypeVar
+import os
+import sqlite3
+import threading
+from models.base import TIMESTAMP_FORMAT
+
+
+class Storage(ABC):
+    """ Storage backend of Base
+
+    When the STORAGE of a class is set, get, all, count, search, save,
+    remove and load_from_file delegate to it instead of the JSON files.
+    """
+
+    @abstractmethod
+    def load(self, cls: type):
+        """ Prepare the storage of a class
+        """
+
+    @abstractmethod
+    def save(self, obj: TypeVar('Base')):
+        """ Insert or update one object
+        """
+
+    @abstractmethod
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete one object
+        """
+
+    @abstractmethod
+    def count(self, cls: type) -> int:
+        """ Number of objects of a class
+        """
+
+    @abstractmethod
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ One object by ID, None if there is none
+        """
+
+    @abstractmethod
+    def search(self, cls: type, attributes: dict = {}, ranges: dict = None,
+               order_by: str = None, reverse: bool = False,
+               limit: int = None) -> List[TypeVar('Base')]:
+        """ Objects with matching attributes, see Base.search
+        """
+
+
+def quote(name: str) -> str:
+    """ Quote an SQL identifier
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def to_sql(value):
+    """ Value of an attribute as stored in SQLite
+    """
+    if type(value) is datetime:
+        return value.strftime(TIMESTAMP_FORMAT)
+    return value
+
+
+class SQLiteStorage(Storage):
+    """ SQLite storage backend
+
+    Each class is stored in its own table, one column per attribute and
+    the ID as primary key. Columns are added as new attributes show up.
+    The INDEXES of a class get an SQL index on the attribute, and its
+    RANGE_INDEXES an SQL index on (attribute, id), the order search()
+    returns objects in.
+    Each thread uses its own connection, in autocommit mode: save and
+    remove are single statements, and WAL lets readers of other
+    processes run during a write.
+    """
+
+    def __init__(self, db_path: str = ".db.sqlite3"):
+        """ Initialize the storage in the database file `db_path`
+        """
+        self.db_path = os.path.abspath(db_path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._columns = {}
+
+    def connection(self) -> sqlite3.Connection:
+        """ Connection of the current thread
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """ Close the connection of the current thread
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def columns(self, cls: type, names: Iterable[str] = ()
+                ) -> Tuple[str, ...]:
+        """ Columns of the table of a class, created with its indexes
+        on first use, and extended with the columns `names`
+        """
+        s_class = cls.__name__
+        columns = self._columns.get(s_class)
+        if columns is not None and all(name in columns for name in names):
+            return columns
+        with self._lock:
+            table = quote(s_class)
+            connection = self.connection()
+            if columns is None:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS {} ({} PRIMARY KEY) "
+                    "WITHOUT ROWID".format(table, quote('id')))
+            columns = tuple(row[1] for row in connection.execute(
+                "PRAGMA table_info({})".format(table)))
+            wanted = list(cls().attributes()) + list(names)
+            for name in wanted:
+                if name not in columns:
+                    connection.execute("ALTER TABLE {} ADD COLUMN {}".format(
+                        table, quote(name)))
+                    columns += (name,)
+            for attr in cls.INDEXES:
+                connection.execute(
+                    "CREATE INDEX IF NOT EXISTS {} ON {} ({})".format(
+                        quote("{}_{}".format(s_class, attr)), table,
+                        quote(attr)))
+            for attr in cls.RANGE_INDEXES:
+                if attr != 'id':
+                    connection.execute(
+                        "CREATE INDEX IF NOT EXISTS {} ON {} ({}, {})".format(
+                            quote("{}_{}_id".format(s_class, attr)), table,
+                            quote(attr), quote('id')))
+            self._columns[s_class] = columns
+        return columns
+
+    def select(self, cls: type, sql: str,
+               params: list) -> List[TypeVar('Base')]:
+        """ Objects of the rows of `SELECT <columns> FROM <table> <sql>`
+        """
+        columns = self.columns(cls)
+        rows = self.connection().execute("SELECT {} FROM {} {}".format(
+            ', '.join(map(quote, columns)), quote(cls.__name__), sql), params)
+        template = dict.fromkeys(columns)
+        return [cls.from_json(dict(zip(columns, row)), template)
+                for row in rows]
+
+    def load(self, cls: type):
+        """ Create the table of a class and its indexes
+        """
+        self.columns(cls)
+
+    def save(self, obj: TypeVar('Base')):
+        """ Upsert the row of one object
+        """
+        cls = type(obj)
+        values = obj.to_json(True)
+        self.columns(cls, values)
+        names = list(values)
+        self.connection().execute(
+            "INSERT INTO {} ({}) VALUES ({}) ON CONFLICT({}) DO UPDATE SET "
+            "{}".format(quote(cls.__name__), ', '.join(map(quote, names)),
+                        ', '.join('?' * len(names)), quote('id'),
+                        ', '.join('{0} = excluded.{0}'.format(quote(name))
+                                  for name in names if name != 'id')),
+            [values[name] for name in names])
+
+    def remove(self, obj: TypeVar('Base')):
+        """ Delete the row of one object
+        """
+        cls = type(obj)
+        self.columns(cls)
+        self.connection().execute("DELETE FROM {} WHERE {} = ?".format(
+            quote(cls.__name__), quote('id')), (obj.id,))
+
+    def count(self, cls: type) -> int:
+        """ Number of rows of the table of a class
+        """
+        self.columns(cls)
+        return self.connection().execute("SELECT COUNT(*) FROM {}".format(
+            quote(cls.__name__))).fetchone()[0]
+
+    def get(self, cls: type, id: str) -> TypeVar('Base'):
+        """ One object by ID, None if there is none
+        """
+        objs = self.select(cls, "WHERE {} = ?".format(quote('id')), [id])
+        return objs[0] if objs else None
+
+    def search(self, cls: type, attributes: dict = {}, ranges: dict = None,
+               order_by: str = None, reverse: bool = False,
+               limit: int = None) -> List[TypeVar('Base')]:
+        """ Objects with matching attributes, see Base.search
+        The search runs as one SQL query: equalities, ranges, order and
+        limit all go to SQLite, which picks the index
+        """
+        columns = self.columns(cls)
+        conditions, params = [], []
+        for k, v in attributes.items():
+            if k not in columns:
+                return []
+            conditions.append("{} IS ?".format(quote(k)))
+            params.append(to_sql(v))
+        for k, (start, end) in (ranges or {}).items():
+            if k not in columns:
+                return []
+            conditions.append("{} IS NOT NULL".format(quote(k)))
+            if start is not None:
+                conditions.append("{} >= ?".format(quote(k)))
+                params.append(to_sql(start))
+            if end is not None:
+                conditions.append("{} < ?".format(quote(k)))
+                params.append(to_sql(end))
+
+        sql = ""
+        if conditions:
+            sql += "WHERE " + " AND ".join(conditions)
+        if order_by is not None:
+            if order_by not in columns:
+                raise AttributeError(order_by)
+            direction = " DESC" if reverse else ""
+            sql += " ORDER BY {}{}".format(quote(order_by), direction)
+            if order_by != 'id':
+                sql += ", {}{}".format(quote('id'), direction)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return self.select(cls, sql, params)
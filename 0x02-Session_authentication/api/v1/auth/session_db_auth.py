@@ -25,7 +25,6 @@ class SessionDBAuth(SessionExpAuth):
             return None
 
         user_session.save()
-        UserSession.save_to_file()
 
         return session_id
 
@@ -35,7 +34,6 @@ class SessionDBAuth(SessionExpAuth):
         """
         if session_id is None:
             return None
-        UserSession.load_from_file()
         user_sess = UserSession.search({'session_id': session_id})
         if not user_sess:
             return None
@@ -73,7 +71,6 @@ class SessionDBAuth(SessionExpAuth):
 
         try:
             session_user[0].remove()
-            UserSession.save_to_file()
         except Exception:
             return False
 
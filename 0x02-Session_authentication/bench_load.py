@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+""" Benchmark of the cold start: loading .db_User.json with json.load
+and User(**kwargs), against the bulk load of User.load_from_file
+The bulk load also rebuilds the indexes of User
+Usage: ./bench_load.py [objects ...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from models.base import DATA
+from models.user import User
+
+
+def write_users(count: int):
+    """ Write a .db_User.json of `count` users in the current directory
+    """
+    DATA['User'] = {}
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i),
+                    first_name="First{}".format(i),
+                    last_name="Last{}".format(i))
+        user.password = "pwd"
+        DATA['User'][user.id] = user
+    User.save_to_file()
+
+
+def legacy_load():
+    """ json.load of the whole file, then User(**kwargs) for each object
+    """
+    DATA['User'] = {}
+    with open(".db_User.json", 'r') as f:
+        for obj_id, obj_json in json.load(f).items():
+            DATA['User'][obj_id] = User(**obj_json)
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    os.chdir(tempfile.mkdtemp())
+    print("{:>9} {:>12} {:>12} {:>8}".format("objects", "legacy (s)",
+                                             "bulk (s)", "speedup"))
+    for count in counts:
+        write_users(count)
+        start = time.perf_counter()
+        legacy_load()
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        User.load_from_file()
+        bulk = time.perf_counter() - start
+        assert User.count() == count
+        print("{:>9} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+            count, legacy, bulk, legacy / bulk))
+        os.remove(".db_User.json")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+""" Benchmark of the memory footprint of User and UserSession objects:
+bytes per object of the slotted models against the same attributes
+held in a per-instance __dict__, as before, then bytes per object loaded
+from file with and without the INTERNED strings of each class
+Usage: ./bench_memory.py [objects]
+"""
+import copy
+import os
+import sys
+import tempfile
+import tracemalloc
+from models import base
+from models.user import User
+from models.user_session import UserSession
+
+
+def measure(build) -> int:
+    """ Bytes allocated by `build()` and still alive
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return after - before
+
+
+def as_dict_object(obj, dict_class: type) -> object:
+    """ Same attributes, values shared with `obj`, in the __dict__ of an
+    instance of `dict_class`, set one by one as __init__ did, so the
+    instances share their dict keys
+    """
+    legacy = dict_class()
+    for name, value in obj.attributes().items():
+        setattr(legacy, name, value)
+    return legacy
+
+
+def measure_load(cls: type) -> int:
+    """ Bytes kept by a load of the class from file into an empty store
+    """
+    for store in (base.DATA, base.HASH_INDEXES, base.SORTED_INDEXES,
+                  base.INDEXED_VALUES, base.SHARD_DATA, base.INTERNS):
+        store.pop(cls.__name__, None)
+    return measure(cls.load_from_file)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    samples = {
+        User: [User(email="user{}@hbtn.io".format(i), _password="0" * 64,
+                    first_name="First{}".format(i),
+                    last_name="Last{}".format(i)) for i in range(count)],
+        UserSession: [UserSession(user_id="user{}".format(i % 100),
+                                  session_id="session{}".format(i))
+                      for i in range(count)],
+    }
+    # names and user IDs repeat as in production data
+    for i, user in enumerate(samples[User]):
+        user.first_name = "First{}".format(i % 500)
+        user.last_name = "Last{}".format(i % 2000)
+    print("{:<12} {:>12} {:>12} {:>8}".format("class", "__dict__ B/obj",
+                                              "slots B/obj", "saved"))
+    for cls, objs in samples.items():
+        # values are shared with `objs`, only the containers are measured
+        dict_class = type(cls.__name__, (), {})
+        legacy = measure(lambda: [as_dict_object(obj, dict_class)
+                                  for obj in objs])
+        slotted = measure(lambda: [copy.copy(obj) for obj in objs])
+        print("{:<12} {:>12.1f} {:>12.1f} {:>7.0%}".format(
+            cls.__name__, legacy / count, slotted / count,
+            1 - slotted / legacy))
+
+    os.chdir(tempfile.mkdtemp())
+    print("\n{:<12} {:>12} {:>14} {:>12}  {}".format(
+        "class", "plain B/obj", "interned B/obj", "saved (MB)", "INTERNED"))
+    for cls, objs in samples.items():
+        base.DATA[cls.__name__] = {obj.id: obj for obj in objs}
+        cls.save_to_file()
+        interned, cls.INTERNED = cls.INTERNED, ()
+        plain = measure_load(cls)
+        cls.INTERNED = interned
+        pooled = measure_load(cls)
+        print("{:<12} {:>12.1f} {:>14.1f} {:>12.1f}  {}".format(
+            cls.__name__, plain / count, pooled / count,
+            (plain - pooled) / 1e6, ", ".join(cls.INTERNED)))
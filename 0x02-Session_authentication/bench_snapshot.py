@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+""" Benchmark of the snapshot formats: User.save_to_file and
+User.load_from_file time and file size, JSON against binary
+Objects are saved fresh from a load, without cached JSON strings
+Usage: ./bench_snapshot.py [objects ...]
+"""
+import os
+import sys
+import tempfile
+import time
+from models.base import DATA
+from models.user import User
+
+
+def write_users(count: int):
+    """ Write a .db_User.json of `count` users in the current directory
+    """
+    DATA['User'] = {}
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i),
+                    first_name="First{}".format(i),
+                    last_name="Last{}".format(i))
+        user.password = "pwd"
+        DATA['User'][user.id] = user
+    User.save_to_file()
+
+
+def bench(snapshot_format: str) -> tuple:
+    """ Save then load time and file size of a snapshot format
+    """
+    User.load_from_file()
+    start = time.perf_counter()
+    User.save_to_file(snapshot_format)
+    save = time.perf_counter() - start
+    start = time.perf_counter()
+    User.load_from_file()
+    load = time.perf_counter() - start
+    return save, load, os.path.getsize(".db_User.json")
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 100000]
+    os.chdir(tempfile.mkdtemp())
+    print("{:>9} {:<7} {:>10} {:>10} {:>10}".format(
+        "objects", "format", "save (s)", "load (s)", "size (MB)"))
+    for count in counts:
+        write_users(count)
+        for snapshot_format in ("json", "binary"):
+            save, load, size = bench(snapshot_format)
+            assert User.count() == count
+            print("{:>9} {:<7} {:>10.3f} {:>10.3f} {:>10.1f}".format(
+                count, snapshot_format, save, load, size / 1e6))
+        os.remove(".db_User.json")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+""" Benchmark of bursty writes: writes per second of User.save on a store
+of existing users, synchronous against write-behind group commits, with
+and without the journal, in one snapshot file or in shards
+The write-behind time includes the final flush()
+Usage: ./bench_writes.py [existing users] [writes]
+"""
+import os
+import sys
+import tempfile
+import time
+from models.base import DATA
+from models.user import User
+
+
+MODES = (("sync", False, False, 1),
+         ("sync, 16 shards", False, False, 16),
+         ("sync, journal", False, True, 1),
+         ("write-behind", True, False, 1),
+         ("write-behind, journal", True, True, 1))
+
+
+def reset_store(existing: int):
+    """ Write a snapshot of `existing` users, without journal
+    """
+    for file_path in User.snapshot_files() + [".db_User.journal"]:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+    DATA['User'] = {}
+    for i in range(existing):
+        user = User(email="user{}@hbtn.io".format(i))
+        DATA['User'][user.id] = user
+    User.save_to_file()
+    User.load_from_file()
+
+
+def bench(writes: int) -> float:
+    """ Time `writes` saves of new users, flush included
+    """
+    start = time.perf_counter()
+    for i in range(writes):
+        User(email="new{}@hbtn.io".format(i)).save()
+    User.flush()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    existing = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    os.chdir(tempfile.mkdtemp())
+    User.FLUSH_INTERVAL = 0.1
+
+    print("{:<22} {:>10} {:>12}".format("mode", "time (s)", "writes/s"))
+    for name, write_behind, journal, shards in MODES:
+        User.SHARDS = shards
+        reset_store(existing)
+        User.WRITE_BEHIND, User.JOURNAL = write_behind, journal
+        elapsed = bench(writes)
+        User.load_from_file()
+        assert User.count() == existing + writes
+        print("{:<22} {:>10.3f} {:>12,.0f}".format(name, elapsed,
+                                                   writes / elapsed))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+""" Round-trip check of iter_json_items: random JSON objects, read back
+in small chunks, decode to what json.loads decodes
+Chunk boundaries fall inside keys, strings, numbers and whitespace
+Usage: ./check_load.py [documents]
+"""
+import io
+import json
+import random
+import sys
+from models.base import iter_json_items
+
+
+MAX_CHUNK = 64
+
+
+def random_value(depth: int = 0):
+    """ A random JSON value, nested up to 3 levels
+    """
+    kind = random.randrange(7 if depth < 3 else 5)
+    if kind == 0:
+        return random.randint(-10 ** 6, 10 ** 6)
+    if kind == 1:
+        return random.choice((1.5, -0.25, 3e-7, 1.5e300, 2.0,
+                              random.uniform(-1e6, 1e6)))
+    if kind == 2:
+        return ''.join(random.choice('ab"\\/\n\té€ ') for _ in range(
+            random.randrange(8)))
+    if kind == 3:
+        return random.choice((True, False))
+    if kind == 4:
+        return None
+    if kind == 5:
+        return [random_value(depth + 1) for _ in range(random.randrange(4))]
+    return {random_value(3) if random.random() < 0.5 else "k": random_value(
+        depth + 1) for _ in range(random.randrange(4))}
+
+
+def random_document() -> str:
+    """ A JSON object of random values, with random spacing
+    """
+    obj = {"key{}".format(i) if random.random() < 0.8 else random_value(3):
+           random_value() for i in range(random.randrange(6))}
+    separators = random.choice(((',', ':'), (', ', ': '), (' ,\n', ' :  ')))
+    return json.dumps(obj, separators=separators,
+                      ensure_ascii=random.random() < 0.5)
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    for _ in range(count):
+        document = random_document()
+        chunk_size = random.randint(1, MAX_CHUNK)
+        try:
+            items = dict(iter_json_items(io.StringIO(document), chunk_size))
+        except ValueError as e:
+            items = e
+        if items != json.loads(document):
+            print("FAIL: {!r} in chunks of {}: {!r}".format(
+                document, chunk_size, items))
+            sys.exit(1)
+    print("OK: {} documents".format(count))
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+""" Check of the pagination of GET /api/v1/users: the time of one page,
+and the memory a page allocates, do not grow with the number of users
+Pages are read from the middle of the id index, as users_page does for
+a `next` link
+Fails if a page of the largest store costs more than MAX_RATIO times
+a page of the smallest
+Usage: ./check_pages.py [users ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from api.v1.views.users import users_page
+from models.base import DATA
+from models.user import User
+
+
+PAGE = 100
+PAGES = 200
+MAX_RATIO = 3
+
+
+def write_users(count: int):
+    """ Save a store of `count` users in the current directory
+    """
+    DATA['User'] = {}
+    for i in range(count):
+        user = User(email="user{}@hbtn.io".format(i))
+        DATA['User'][user.id] = user
+    User.save_to_file()
+    User.load_from_file()
+
+
+def measure() -> tuple:
+    """ Seconds and peak bytes of one page after the median ID
+    """
+    after = sorted(DATA['User'])[len(DATA['User']) // 2]
+    users_page(after, PAGE)
+    start = time.perf_counter()
+    for _ in range(PAGES):
+        page = users_page(after, PAGE)
+    elapsed = (time.perf_counter() - start) / PAGES
+    assert len(page) == PAGE and page[0].id > after
+    tracemalloc.start()
+    users_page(after, PAGE)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == '__main__':
+    counts = [int(arg) for arg in sys.argv[1:]] or [10000, 200000]
+    os.chdir(tempfile.mkdtemp())
+    print("{:>9} {:>12} {:>12}".format("users", "page (us)", "peak (kB)"))
+    results = []
+    for count in counts:
+        write_users(count)
+        results.append(measure())
+        print("{:>9} {:>12.1f} {:>12.1f}".format(
+            count, results[-1][0] * 1e6, results[-1][1] / 1e3))
+    (time_min, peak_min), (time_max, peak_max) = results[0], results[-1]
+    if time_max > MAX_RATIO * time_min or peak_max > MAX_RATIO * peak_min:
+        print("FAIL: the cost of a page grows with the number of users")
+        sys.exit(1)
+    print("OK")
@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+""" Convert the snapshots of the object store between the JSON and the
+binary formats, in the current directory
+The journal of each class is compacted into its new snapshot
+Usage: ./convert_store.py json|binary [Class ...]
+"""
+import sys
+from models.user import User
+from models.user_session import UserSession
+
+
+CLASSES = {cls.__name__: cls for cls in (User, UserSession)}
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in ("json", "binary") or \
+            any(name not in CLASSES for name in sys.argv[2:]):
+        print(__doc__.strip().splitlines()[-1], file=sys.stderr)
+        sys.exit(2)
+    for name in sys.argv[2:] or CLASSES:
+        CLASSES[name].convert_snapshot(sys.argv[1])
+        print("{}: {} objects".format(name, CLASSES[name].count()))
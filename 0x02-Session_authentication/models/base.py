@@ -1,27 +1,340 @@
 #!/usr/bin/env python3
 """ Base module
 """
-from datetime import datetime
-from typing import TypeVar, List, Iterable
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from itertools import count, islice
+from typing import (IO, Callable, Iterator, TypeVar, List, Iterable,
+                    Tuple)
 from os import path
+import atexit
+import glob
+import io
 import json
+import marshal
+import os
+import re
+import struct
+import threading
+import types
 import uuid
+import zlib
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 
 TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
 DATA = {}
+JOURNAL_SIZES = {}
+HASH_INDEXES = {}
+SORTED_INDEXES = {}
+INDEXED_VALUES = {}
+LOCKS = {}
+SIGNATURES = {}
+PENDING = {}
+SHARD_DATA = {}
+INTERNS = {}
+FLUSH_TIMERS = {}
+SNAPSHOT_MAGIC = b'\x00BDB'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_BLOCK = 1024
+EPOCH = datetime(1970, 1, 1)
+_MISSING = object()
+_CACHE = '_json_cache'
+_BLOCK_SIZE = struct.Struct('<I')
+_MICROSECOND = timedelta(microseconds=1)
+_WRITES = count()
+
+
+def sort_key(value) -> Tuple:
+    """ Sort key of an attribute value, None sorts first
+    """
+    return (value is not None, value)
+
+
+@lru_cache(maxsize=None)
+def slot_names(cls: type) -> Tuple[str, ...]:
+    """ Names of the slots of a class and of its parents, parents first
+    """
+    names = []
+    for klass in reversed(cls.__mro__):
+        slots = klass.__dict__.get('__slots__', ())
+        if isinstance(slots, str):
+            slots = (slots,)
+        names.extend(name for name in slots
+                     if name not in ('__dict__', '__weakref__', _CACHE))
+    return tuple(names)
+
+
+class StoreLock():
+    """ Lock serializing the writes to the objects of a class
+
+    Within the process it is a reentrant thread lock. Across processes,
+    the outermost acquisition also takes an exclusive advisory lock on
+    `.db_<Class>.lock` (flock, where the platform has it).
+    Readers never take it: they work on snapshots of DATA and the indexes
+    """
+
+    def __init__(self, s_class: str):
+        """ Initialize the lock of a class
+        """
+        self.path = ".db_{}.lock".format(s_class)
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self) -> 'StoreLock':
+        """ Acquire the thread lock, then the file lock
+        """
+        self._lock.acquire()
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        """ Release the file lock, then the thread lock
+        """
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            self._file.close()
+            self._file = None
+        self._lock.release()
+
+
+def store_lock(s_class: str) -> StoreLock:
+    """ StoreLock of a class
+    """
+    lock = LOCKS.get(s_class)
+    if lock is None:
+        lock = LOCKS.setdefault(s_class, StoreLock(s_class))
+    return lock
+
+
+def file_signature(file_paths: Iterable[str]) -> Tuple:
+    """ Inode, size and modification time of each file, None if missing
+    Every write changes it: a snapshot is replaced by a new file and a
+    journal only grows until it is removed
+    """
+    signature = ()
+    for file_path in file_paths:
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            signature += (None,)
+        else:
+            signature += ((st.st_ino, st.st_size, st.st_mtime_ns),)
+    return signature
+
+
+def intern_pool(s_class: str) -> dict:
+    """ Pool of the interned strings of a class, each string mapped to
+    itself
+    """
+    pool = INTERNS.get(s_class)
+    if pool is None:
+        pool = INTERNS.setdefault(s_class, {})
+    return pool
+
+
+def shard_of(obj_id: str, shards: int) -> int:
+    """ Shard of an object ID
+    crc32 puts an ID in the same shard in every process, unlike the
+    salted hash()
+    """
+    return zlib.crc32(obj_id.encode()) % shards
+
+
+def parse_timestamp(value: str) -> datetime:
+    """ Parse a TIMESTAMP_FORMAT string
+    fromisoformat parses this fixed format much faster than strptime
+    """
+    return datetime.fromisoformat(value)
+
+
+_JSON_KEY = re.compile(r'[ \t\n\r]*[{,][ \t\n\r]*("(?:[^"\\]|\\.)*")'
+                       r'[ \t\n\r]*:[ \t\n\r]*')
+_JSON_END = re.compile(r'[ \t\n\r]*{?[ \t\n\r]*}')
+_JSON_NEXT = re.compile(r'[ \t\n\r]*[,}]')
+
+
+def iter_json_items(f: IO, chunk_size: int = 1 << 20
+                    ) -> Iterator[Tuple[str, dict]]:
+    """ Iterate over the items of the JSON object stored in a file
+    The file is read and decoded chunk by chunk, so the whole document
+    is never held in memory
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = f.read(chunk_size), 0, False
+    while True:
+        try:
+            match = _JSON_KEY.match(buf, pos)
+            if match is None:
+                if _JSON_END.match(buf, pos):
+                    return
+                raise json.JSONDecodeError("Expecting key", buf, pos)
+            key = match.group(1)
+            key = key[1:-1] if '\\' not in key else json.loads(key)
+            value, end = decoder.raw_decode(buf, match.end())
+            if not eof and not _JSON_NEXT.match(buf, end):
+                # a number cut by the end of the chunk, 1. of 1.5 or 1.5e
+                # of 1.5e3, decodes as a shorter one: a value is only
+                # complete once a separator follows
+                raise json.JSONDecodeError("Unexpected end", buf, end)
+            yield key, value
+            pos = end
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            buf, pos, eof = buf[pos:] + chunk, 0, not chunk
+
+
+def iter_index(keys: list, start: Tuple = None, end: Tuple = None,
+               reverse: bool = False, window: int = None) -> Iterator[Tuple]:
+    """ Keys of a sorted index from `start` included to `end` excluded,
+    None for no bound, copied `window` keys at a time, the window
+    doubling each time, or all at once without window
+    A read stopped early copies little more than it reads. Each window
+    resumes after the last key read, so keys that writers insert or
+    remove meanwhile shift no other key in or out, and an object whose
+    key moved past the window is not read twice.
+    """
+    seen = set()
+    lo_bisect = bisect_left
+    while True:
+        lo = 0 if start is None else lo_bisect(keys, start)
+        hi = len(keys) if end is None else bisect_left(keys, end)
+        size = hi - lo if window is None else min(window, hi - lo)
+        if size <= 0:
+            return
+        if reverse:
+            chunk = keys[hi - size:hi][::-1]
+        else:
+            chunk = keys[lo:lo + size]
+        if not chunk:
+            # writers removed the keys between the bisect and the copy
+            return
+        if window is None:
+            yield from chunk
+            return
+        for key in chunk:
+            if key[-1] not in seen:
+                seen.add(key[-1])
+                yield key
+        if reverse:
+            end = chunk[-1]
+        else:
+            start, lo_bisect = chunk[-1], bisect_right
+        window *= 2
+
+
+def write_block(f: IO, value):
+    """ Write one block of a binary snapshot: its size, then the
+    marshal of `value`
+    """
+    payload = marshal.dumps(value)
+    f.write(_BLOCK_SIZE.pack(len(payload)))
+    f.write(payload)
+
+
+def read_block(f: IO):
+    """ Read one block of a binary snapshot, None at the end of the file
+    """
+    size = f.read(_BLOCK_SIZE.size)
+    if not size:
+        return None
+    if len(size) == _BLOCK_SIZE.size:
+        size = _BLOCK_SIZE.unpack(size)[0]
+        payload = f.read(size)
+        if len(payload) == size:
+            return marshal.loads(payload)
+    raise ValueError("binary snapshot cut short")
 
 
 class Base():
     """ Base class
+
+    Persistence of a class goes to `.db_<Class>.json`. With JOURNAL set,
+    save() and remove() append one record to `.db_<Class>.journal`
+    instead, and the journal is compacted into the JSON snapshot every
+    COMPACT_EVERY records.
+
+    INDEXES lists the attributes of a class kept in hash indexes, used
+    by search() instead of a scan. Indexes follow save(), remove() and
+    load_from_file(): changes of a saved object are indexed on its next
+    save().
+    RANGE_INDEXES lists the attributes kept sorted, for the ranges and
+    order_by of search().
+
+    Attributes are stored in __slots__, subclasses declare theirs to
+    stay without a per-instance __dict__.
+    The JSON representations of an object are cached until one of its
+    attributes is assigned.
+
+    Writes to a class (save, remove, load_from_file, save_to_file) are
+    serialized by its store_lock, reads take no lock and never see a
+    half-applied write.
+    Several processes can share the files: a write first reloads what
+    other processes wrote, and reads (count, all, get, search) reload
+    only when the file_signature of the files changed.
+
+    With WRITE_BEHIND set, save() and remove() only queue their change:
+    the queue is written in one go FLUSH_INTERVAL seconds after its first
+    change, once it holds FLUSH_EVERY changes, on flush() or at exit.
+    Until then other processes don't see the changes.
+
+    SNAPSHOT_FORMAT is the format save_to_file() writes: "json", or
+    "binary" for blocks of marshaled records with timestamps in
+    microseconds since EPOCH. load_from_file() detects the format from
+    the SNAPSHOT_MAGIC, and convert_snapshot() rewrites a snapshot in
+    either format.
+
+    With SHARDS above 1, the snapshot is split into `.db_<Class>.<k>.json`
+    files by shard_of the IDs: save() and remove() rewrite the shard of
+    their object only, and a process reloads only the shards other
+    processes changed. A full load reads the shards one after the other:
+    decoding holds the GIL, so threads would not speed it up.
+    Every process sharing the files must use the same SHARDS; files of
+    another layout are read once and rewritten in the current one.
+
+    INTERNED lists string attributes with few distinct values, like the
+    user_id of sessions: objects share one string per value through the
+    intern_pool of the class, on assignment and on load. A full load
+    starts a new pool, so values no object holds anymore are dropped.
+
+    STORAGE replaces the JSON files with a storage backend (see
+    models.storage): the objects then live in the backend only.
     """
+    __slots__ = ('id', 'created_at', 'updated_at', _CACHE)
+    JOURNAL = False
+    COMPACT_EVERY = 1000
+    WRITE_BEHIND = False
+    FLUSH_INTERVAL = 1.0
+    FLUSH_EVERY = 1000
+    SNAPSHOT_FORMAT = "json"
+    SHARDS = 1
+    INTERNED = ()
+    INDEXES = ()
+    RANGE_INDEXES = ()
+    STORAGE = None
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a Base instance
         """
         s_class = str(self.__class__.__name__)
-        if DATA.get(s_class) is None:
-            DATA[s_class] = {}
+        DATA.setdefault(s_class, {})
 
         self.id = kwargs.get('id', str(uuid.uuid4()))
         if kwargs.get('created_at') is not None:
@@ -44,68 +357,550 @@ class Base():
             return False
         return (self.id == other.id)
 
+    def __setattr__(self, name: str, value):
+        """ Assign an attribute, dropping the cached JSON representations
+        """
+        if name in self.INTERNED and type(value) is str:
+            pool = intern_pool(self.__class__.__name__)
+            value = pool.setdefault(value, value)
+        object.__setattr__(self, name, value)
+        # counted between the assignment and the reset: see _json_cached
+        next(_WRITES)
+        object.__setattr__(self, _CACHE, None)
+
+    def attributes(self) -> dict:
+        """ Attributes of the object, from its slots then its __dict__
+        """
+        result = {}
+        for name in slot_names(type(self)):
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                result[name] = value
+        result.update(getattr(self, '__dict__', {}))
+        return result
+
     def to_json(self, for_serialization: bool = False) -> dict:
         """ Convert the object a JSON dictionary
         """
+        return self._json_cached()[for_serialization].copy()
+
+    def to_json_string(self, for_serialization: bool = False) -> str:
+        """ Encoded JSON dictionary of the object
+        """
+        cache = self._json_cached()
+        if cache[2 + for_serialization] is None:
+            cache[2 + for_serialization] = json.dumps(cache[for_serialization])
+        return cache[2 + for_serialization]
+
+    def _json_cached(self) -> list:
+        """ Cached [public dict, serialization dict,
+        public string, serialization string]
+        """
+        cache = getattr(self, _CACHE, None)
+        if cache is not None:
+            return cache
+        ticket = next(_WRITES)
+        result = self._serialization()
+        public = {key: value for key, value in result.items()
+                  if key[0] != '_'}
+        cache = [public, result, None, None]
+        object.__setattr__(self, _CACHE, cache)
+        if next(_WRITES) != ticket + 1:
+            # an attribute may have been assigned meanwhile, in this
+            # object or another one: an assignment counted after this
+            # check resets the cache itself
+            object.__setattr__(self, _CACHE, None)
+        return cache
+
+    def _serialization(self) -> dict:
+        """ Serialization dictionary of the object, not cached
+        """
         result = {}
-        for key, value in self.__dict__.items():
-            if not for_serialization and key[0] == '_':
-                continue
+        for key, value in self.attributes().items():
             if type(value) is datetime:
                 result[key] = value.strftime(TIMESTAMP_FORMAT)
             else:
                 result[key] = value
         return result
 
+    def _serialized(self) -> str:
+        """ Encoded serialization dictionary of the object, from the cache
+        if there is one, without filling it otherwise
+        """
+        cache = getattr(self, _CACHE, None)
+        if cache is None:
+            return json.dumps(self._serialization())
+        if cache[3] is None:
+            return json.dumps(cache[1])
+        return cache[3]
+
     @classmethod
     def load_from_file(cls):
-        """ Load all objects from file
+        """ Load all objects from file, then replay the journal
+        The objects and their indexes are built aside, then published
+        """
+        if cls.STORAGE is not None:
+            return cls.STORAGE.load(cls)
+        s_class = cls.__name__
+        with store_lock(s_class):
+            INTERNS[s_class] = {}
+            data = {}
+            journal_size = 0
+            template = cls().attributes()
+            file_paths = cls.snapshot_files()
+            if len(file_paths) == 1:
+                data = cls.read_snapshot(file_paths[0], template)
+            else:
+                for file_path in file_paths:
+                    data.update(cls.read_snapshot(file_path, template))
+
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                with open(journal_path, 'rb+') as f:
+                    offset = 0
+                    for line in f:
+                        try:
+                            if not line.endswith(b"\n"):
+                                raise ValueError(line)
+                            entry = json.loads(line)
+                        except ValueError:
+                            # record cut short by a crash while appending
+                            f.truncate(offset)
+                            break
+                        offset += len(line)
+                        if entry["op"] == "save":
+                            obj = cls.from_json(entry["obj"], template)
+                            data[obj.id] = obj
+                        else:
+                            data.pop(entry["id"], None)
+                        journal_size += 1
+
+            for op, value in PENDING.get(s_class, ()):
+                # changes not written yet stay on top of the files
+                if op == "save":
+                    data[value.id] = value
+                else:
+                    data.pop(value, None)
+
+            indexes = cls.build_indexes(data)
+            shards = cls.split_shards(data)
+            DATA[s_class] = data
+            SHARD_DATA[s_class] = shards
+            HASH_INDEXES[s_class], SORTED_INDEXES[s_class], \
+                INDEXED_VALUES[s_class] = indexes
+            JOURNAL_SIZES[s_class] = journal_size
+            SIGNATURES[s_class] = cls.signature()
+            if set(file_paths) - set(cls.snapshot_paths()):
+                cls.save_to_file()
+
+    @classmethod
+    def read_snapshot(cls, file_path: str, template: dict) -> dict:
+        """ Objects of one snapshot file by ID, in either format
+        """
+        data = {}
+        with open(file_path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC:
+                for obj in cls.iter_binary_snapshot(f, template):
+                    data[obj.id] = obj
+            else:
+                f.seek(0)
+                for obj_id, obj_json in iter_json_items(
+                        io.TextIOWrapper(f, encoding='utf-8')):
+                    data[obj_id] = cls.from_json(obj_json, template)
+        return data
+
+    @classmethod
+    def reload_shards(cls, shards: List[int]):
+        """ Reload the snapshots of some shards
+        Objects with the same JSON in memory and in file are kept, the
+        others are replaced and reindexed
         """
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        DATA[s_class] = {}
-        if not path.exists(file_path):
+        with store_lock(s_class):
+            template = cls().attributes()
+            file_paths = cls.snapshot_paths()
+            objs = DATA[s_class]
+            shard_dicts = cls.shard_dicts()
+            for k in shards:
+                loaded = {}
+                if path.exists(file_paths[k]):
+                    loaded = cls.read_snapshot(file_paths[k], template)
+                shard = shard_dicts[k]
+                for obj_id in [i for i in shard if i not in loaded]:
+                    del shard[obj_id], objs[obj_id]
+                    cls.unindex(obj_id)
+                for obj_id, obj in loaded.items():
+                    old = shard.get(obj_id)
+                    if old is None or old._serialized() != \
+                            obj._serialized():
+                        shard[obj_id] = objs[obj_id] = obj
+                        cls.index(obj)
+
+            for op, value in PENDING.get(s_class, ()):
+                # changes not written yet stay on top of the files
+                obj_id = value.id if op == "save" else value
+                if shard_of(obj_id, cls.SHARDS) not in shards:
+                    continue
+                shard = shard_dicts[shard_of(obj_id, cls.SHARDS)]
+                if op == "save":
+                    shard[obj_id] = objs[obj_id] = value
+                    cls.index(value)
+                elif objs.pop(obj_id, None) is not None:
+                    del shard[obj_id]
+                    cls.unindex(obj_id)
+            SIGNATURES[s_class] = cls.signature()
+
+    @classmethod
+    def snapshot_paths(cls) -> List[str]:
+        """ Snapshot files of the class, one per shard
+        """
+        s_class = cls.__name__
+        if cls.SHARDS <= 1:
+            return [".db_{}.json".format(s_class)]
+        return [".db_{}.{}.json".format(s_class, k)
+                for k in range(cls.SHARDS)]
+
+    @classmethod
+    def snapshot_files(cls) -> List[str]:
+        """ Snapshot files of the class found on disk, of any SHARDS
+        """
+        s_class = glob.escape(cls.__name__)
+        return sorted(glob.glob(".db_{}.json".format(s_class)) +
+                      glob.glob(".db_{}.*.json".format(s_class)))
+
+    @classmethod
+    def signature(cls) -> Tuple:
+        """ file_signature of the snapshots and the journal of the class
+        """
+        return file_signature(cls.snapshot_paths() +
+                              [".db_{}.journal".format(cls.__name__)])
+
+    @classmethod
+    def split_shards(cls, data: dict) -> List[dict]:
+        """ Objects of `data` by shard, nothing without SHARDS
+        """
+        if cls.SHARDS <= 1:
+            return []
+        shards = [{} for _ in range(cls.SHARDS)]
+        for obj_id, obj in data.items():
+            shards[shard_of(obj_id, cls.SHARDS)][obj_id] = obj
+        return shards
+
+    @classmethod
+    def shard_dicts(cls) -> List[dict]:
+        """ Objects of the class by shard
+        """
+        s_class = cls.__name__
+        shards = SHARD_DATA.get(s_class)
+        if shards is None or len(shards) != cls.SHARDS:
+            shards = SHARD_DATA[s_class] = cls.split_shards(DATA[s_class])
+        return shards
+
+    @classmethod
+    def refresh(cls):
+        """ Reload the objects if their files changed since the last load
+        or write of this process
+        """
+        if cls.STORAGE is not None:
             return
+        s_class = cls.__name__
+        if SIGNATURES.get(s_class) == cls.signature():
+            return
+        with store_lock(s_class):
+            old, signature = SIGNATURES.get(s_class), cls.signature()
+            if old == signature:
+                return
+            if cls.SHARDS > 1 and old is not None and \
+                    len(old) == len(signature) and old[-1] == signature[-1]:
+                cls.reload_shards([k for k in range(cls.SHARDS)
+                                   if old[k] != signature[k]])
+            else:
+                cls.load_from_file()
 
-        with open(file_path, 'r') as f:
-            objs_json = json.load(f)
-            for obj_id, obj_json in objs_json.items():
-                DATA[s_class][obj_id] = cls(**obj_json)
+    @classmethod
+    def from_json(cls, obj_json: dict,
+                  template: dict = None) -> TypeVar('Base'):
+        """ Build an object from its serialized JSON dictionary
+        Bulk loads skip __init__: every attribute of `template`, the
+        attributes of a new instance, is taken from `obj_json` or else
+        from `template`, timestamps are parsed with fromisoformat and
+        INTERNED strings interned
+        """
+        if template is None:
+            template = cls().attributes()
+        interned = cls.INTERNED
+        obj = cls.__new__(cls)
+        for key, default in template.items():
+            value = obj_json.get(key, default)
+            if type(value) is str:
+                if key == 'created_at' or key == 'updated_at':
+                    value = parse_timestamp(value)
+                elif key in interned:
+                    value = intern_pool(cls.__name__).setdefault(value,
+                                                                 value)
+            object.__setattr__(obj, key, value)
+        return obj
 
     @classmethod
-    def save_to_file(cls):
-        """ Save all objects to file
+    def iter_binary_snapshot(cls, f: IO,
+                             template: dict) -> Iterator[TypeVar('Base')]:
+        """ Objects of a binary snapshot, read after its SNAPSHOT_MAGIC
+        Like from_json, every attribute of `template` is set, from the
+        record or else from `template`, and the other columns are skipped
         """
+        version = f.read(1)
+        if not version or version[0] > SNAPSHOT_VERSION:
+            raise ValueError("unsupported snapshot version")
+        header = read_block(f)
+        setters, stamps = [], []
+        for name in header["columns"]:
+            if name not in template:
+                setters.append(None)
+                continue
+            if name in header["timestamps"]:
+                stamps.append(len(setters))
+            slot = getattr(cls, name, None)
+            if isinstance(slot, types.MemberDescriptorType):
+                setter = slot.__set__
+            else:
+                setter = (lambda obj, value, name=name:
+                          object.__setattr__(obj, name, value))
+            if name in cls.INTERNED:
+                setter = partial(cls.set_interned, setter,
+                                 intern_pool(cls.__name__))
+            setters.append(setter)
+        missing = [(name, default) for name, default in template.items()
+                   if name not in header["columns"]]
+        while True:
+            block = read_block(f)
+            if block is None:
+                return
+            for record in block:
+                record = list(record)
+                for i in stamps:
+                    if record[i] is not None and record[i] is not ...:
+                        record[i] = EPOCH + timedelta(0, 0, record[i])
+                obj = cls.__new__(cls)
+                for setter, name, value in zip(setters, header["columns"],
+                                               record):
+                    if setter is not None:
+                        setter(obj, template[name] if value is ...
+                               else value)
+                for name, default in missing:
+                    object.__setattr__(obj, name, default)
+                yield obj
+
+    @staticmethod
+    def set_interned(setter: Callable, pool: dict, obj: TypeVar('Base'),
+                     value):
+        """ Call `setter` with the interned `value` when it is a string
+        """
+        if type(value) is str:
+            value = pool.setdefault(value, value)
+        setter(obj, value)
+
+    @classmethod
+    def write_binary_snapshot(cls, f: IO, objs: Iterable[TypeVar('Base')]):
+        """ Write objects as a binary snapshot
+        Each record is the tuple of the attributes of an object, ... for
+        a missing one; created_at and updated_at are stored as
+        microseconds since EPOCH, other datetimes as TIMESTAMP_FORMAT
+        """
+        columns = tuple(cls().attributes())
+        timestamps = ('created_at', 'updated_at')
+        f.write(SNAPSHOT_MAGIC + bytes((SNAPSHOT_VERSION,)))
+        write_block(f, {"columns": columns, "timestamps": timestamps})
+
+        def record(obj):
+            attributes = obj.attributes()
+            values = []
+            for name in columns:
+                value = attributes.get(name, ...)
+                if type(value) is datetime:
+                    if name in timestamps:
+                        value = (value - EPOCH) // _MICROSECOND
+                    else:
+                        value = value.strftime(TIMESTAMP_FORMAT)
+                values.append(value)
+            return tuple(values)
+
+        objs = iter(objs)
+        while True:
+            block = [record(obj) for obj in islice(objs, SNAPSHOT_BLOCK)]
+            if not block:
+                return
+            write_block(f, block)
+
+    @classmethod
+    def write_snapshot(cls, file_path: str, objs: dict,
+                       snapshot_format: str):
+        """ Write objects by ID to a snapshot file, replaced atomically
+        """
+        if snapshot_format == "binary":
+            with open(file_path + ".tmp", 'wb') as f:
+                cls.write_binary_snapshot(f, objs.values())
+        else:
+            with open(file_path + ".tmp", 'w') as f:
+                f.write('{')
+                f.write(', '.join('{}: {}'.format(json.dumps(obj_id),
+                                                  obj._serialized())
+                                  for obj_id, obj in objs.items()))
+                f.write('}')
+        os.replace(file_path + ".tmp", file_path)
+
+    @classmethod
+    def save_to_file(cls, snapshot_format: str = None,
+                     shards: Iterable[int] = None):
+        """ Save all objects to file, which compacts the journal
+        snapshot_format: "json" or "binary", SNAPSHOT_FORMAT by default
+        shards: with SHARDS, rewrite only these shards, unless a journal
+                is left to compact
+        A storage backend saves every object on its save()
+        """
+        if cls.STORAGE is not None:
+            return
+        snapshot_format = snapshot_format or cls.SNAPSHOT_FORMAT
+        if snapshot_format not in ("json", "binary"):
+            raise ValueError("unknown snapshot format")
         s_class = cls.__name__
-        file_path = ".db_{}.json".format(s_class)
-        objs_json = {}
-        for obj_id, obj in DATA[s_class].items():
-            objs_json[obj_id] = obj.to_json(True)
+        file_paths = cls.snapshot_paths()
+        with store_lock(s_class):
+            if cls.SHARDS <= 1:
+                cls.write_snapshot(file_paths[0], DATA[s_class],
+                                   snapshot_format)
+            elif shards is not None and not JOURNAL_SIZES.get(s_class):
+                shard_dicts = cls.shard_dicts()
+                for k in shards:
+                    cls.write_snapshot(file_paths[k], shard_dicts[k],
+                                       snapshot_format)
+                SIGNATURES[s_class] = cls.signature()
+                return
+            else:
+                SHARD_DATA[s_class] = cls.split_shards(DATA[s_class])
+                for file_path, objs in zip(file_paths, SHARD_DATA[s_class]):
+                    cls.write_snapshot(file_path, objs, snapshot_format)
 
-        with open(file_path, 'w') as f:
-            json.dump(objs_json, f)
+            for file_path in set(cls.snapshot_files()) - set(file_paths):
+                # snapshot of another SHARDS
+                os.remove(file_path)
+            journal_path = ".db_{}.journal".format(s_class)
+            if path.exists(journal_path):
+                os.remove(journal_path)
+            JOURNAL_SIZES[s_class] = 0
+            SIGNATURES[s_class] = cls.signature()
+
+    @classmethod
+    def convert_snapshot(cls, snapshot_format: str):
+        """ Rewrite the snapshot of the class in `snapshot_format`, "json"
+        or "binary", with the journal compacted into it
+        """
+        with store_lock(cls.__name__):
+            cls.load_from_file()
+            cls.save_to_file(snapshot_format)
+
+    @classmethod
+    def append_to_journal(cls, *entries: str):
+        """ Append JSON records to the journal, compact it when full
+        """
+        s_class = cls.__name__
+        with store_lock(s_class):
+            with open(".db_{}.journal".format(s_class), 'a') as f:
+                f.write(''.join(entry + "\n" for entry in entries))
+            JOURNAL_SIZES[s_class] = JOURNAL_SIZES.get(s_class, 0) + \
+                len(entries)
+            SIGNATURES[s_class] = cls.signature()
+            if JOURNAL_SIZES[s_class] >= cls.COMPACT_EVERY:
+                cls.save_to_file()
 
     def save(self):
         """ Save current object
         """
+        if self.STORAGE is not None:
+            self.updated_at = datetime.utcnow()
+            return self.STORAGE.save(self)
         s_class = self.__class__.__name__
-        self.updated_at = datetime.utcnow()
-        DATA[s_class][self.id] = self
-        self.__class__.save_to_file()
+        with store_lock(s_class):
+            self.__class__.refresh()
+            self.updated_at = datetime.utcnow()
+            DATA[s_class][self.id] = self
+            if self.SHARDS > 1:
+                self.__class__.shard_dicts()[
+                    shard_of(self.id, self.SHARDS)][self.id] = self
+            self.__class__.index(self)
+            self.__class__.write_change(("save", self))
 
     def remove(self):
         """ Remove object
         """
+        if self.STORAGE is not None:
+            return self.STORAGE.remove(self)
         s_class = self.__class__.__name__
-        if DATA[s_class].get(self.id) is not None:
+        with store_lock(s_class):
+            self.__class__.refresh()
+            if DATA[s_class].get(self.id) is None:
+                return
             del DATA[s_class][self.id]
-            self.__class__.save_to_file()
+            if self.SHARDS > 1:
+                self.__class__.shard_dicts()[
+                    shard_of(self.id, self.SHARDS)].pop(self.id, None)
+            self.__class__.unindex(self.id)
+            self.__class__.write_change(("remove", self.id))
+
+    @classmethod
+    def write_change(cls, change: Tuple):
+        """ Write one change, ("save", object) or ("remove", ID), or queue
+        it with WRITE_BEHIND
+        """
+        if not cls.WRITE_BEHIND:
+            return cls.write_changes([change])
+        s_class = cls.__name__
+        with store_lock(s_class):
+            pending = PENDING.setdefault(s_class, [])
+            pending.append(change)
+            if len(pending) >= cls.FLUSH_EVERY:
+                cls.flush()
+            elif s_class not in FLUSH_TIMERS:
+                timer = threading.Timer(cls.FLUSH_INTERVAL, cls.flush)
+                timer.daemon = True
+                FLUSH_TIMERS[s_class] = timer
+                timer.start()
+
+    @classmethod
+    def write_changes(cls, changes: List[Tuple]):
+        """ Append changes to the journal, or save their shards to file
+        """
+        if not cls.JOURNAL:
+            return cls.save_to_file(shards={
+                shard_of(value.id if op == "save" else value, cls.SHARDS)
+                for op, value in changes})
+        cls.append_to_journal(*(
+            '{"op": "save", "obj": ' + value.to_json_string(True) + '}'
+            if op == "save" else json.dumps({"op": "remove", "id": value})
+            for op, value in changes))
+
+    @classmethod
+    def flush(cls):
+        """ Write the queued changes of the class in one go
+        """
+        s_class = cls.__name__
+        with store_lock(s_class):
+            cls.refresh()
+            timer = FLUSH_TIMERS.pop(s_class, None)
+            if timer is not None:
+                timer.cancel()
+            changes = PENDING.get(s_class)
+            if changes:
+                cls.write_changes(changes)
+            PENDING.pop(s_class, None)
 
     @classmethod
     def count(cls) -> int:
         """ Count all objects
         """
+        if cls.STORAGE is not None:
+            return cls.STORAGE.count(cls)
         s_class = cls.__name__
+        cls.refresh()
         return len(DATA[s_class].keys())
 
     @classmethod
@@ -118,21 +913,185 @@ class Base():
     def get(cls, id: str) -> TypeVar('Base'):
         """ Return one object by ID
         """
+        if cls.STORAGE is not None:
+            return cls.STORAGE.get(cls, id)
         s_class = cls.__name__
+        cls.refresh()
         return DATA[s_class].get(id)
 
     @classmethod
-    def search(cls, attributes: dict = {}) -> List[TypeVar('Base')]:
+    def build_indexes(cls, data: dict) -> Tuple[dict, dict, dict]:
+        """ Hash indexes, sorted indexes and indexed values of `data`
+        """
+        hash_indexes = {attr: {} for attr in cls.INDEXES}
+        sorted_indexes = {attr: [] for attr in cls.RANGE_INDEXES}
+        indexed_values = {}
+        attrs = cls.INDEXES + cls.RANGE_INDEXES
+        if attrs:
+            for obj in data.values():
+                values = tuple(getattr(obj, attr, None) for attr in attrs)
+                for attr, value in zip(cls.INDEXES, values):
+                    hash_indexes[attr].setdefault(value, {})[obj.id] = obj
+                for attr, value in zip(cls.RANGE_INDEXES,
+                                       values[len(cls.INDEXES):]):
+                    sorted_indexes[attr].append(sort_key(value) + (obj.id,))
+                indexed_values[obj.id] = values
+            for keys in sorted_indexes.values():
+                keys.sort()
+        return hash_indexes, sorted_indexes, indexed_values
+
+    @classmethod
+    def rebuild_indexes(cls):
+        """ Index every object of the class
+        """
+        s_class = cls.__name__
+        with store_lock(s_class):
+            HASH_INDEXES[s_class], SORTED_INDEXES[s_class], \
+                INDEXED_VALUES[s_class] = cls.build_indexes(DATA[s_class])
+
+    @classmethod
+    def index(cls, obj: TypeVar('Base')):
+        """ (Re)index one object under its current attribute values
+        """
+        if not cls.INDEXES and not cls.RANGE_INDEXES:
+            return
+        s_class = cls.__name__
+        if s_class not in HASH_INDEXES:
+            cls.rebuild_indexes()
+        values = tuple(getattr(obj, attr, None)
+                       for attr in cls.INDEXES + cls.RANGE_INDEXES)
+        olds = INDEXED_VALUES[s_class].get(obj.id)
+        if olds is None:
+            olds = (_MISSING,) * len(values)
+        # new entries go in before the old ones go out: a reader without
+        # the lock always finds the object under one of its values
+        for attr, value, old in zip(cls.INDEXES, values, olds):
+            HASH_INDEXES[s_class][attr].setdefault(value, {})[obj.id] = obj
+            if old is not _MISSING and old != value:
+                bucket = HASH_INDEXES[s_class][attr][old]
+                del bucket[obj.id]
+                if not bucket:
+                    del HASH_INDEXES[s_class][attr][old]
+        n_hash = len(cls.INDEXES)
+        for attr, value, old in zip(cls.RANGE_INDEXES, values[n_hash:],
+                                    olds[n_hash:]):
+            key = sort_key(value) + (obj.id,)
+            if old is not _MISSING:
+                old_key = sort_key(old) + (obj.id,)
+                if old_key == key:
+                    continue
+            keys = SORTED_INDEXES[s_class][attr]
+            insort(keys, key)
+            if old is not _MISSING:
+                del keys[bisect_left(keys, old_key)]
+        INDEXED_VALUES[s_class][obj.id] = values
+
+    @classmethod
+    def unindex(cls, obj_id: str):
+        """ Drop one object from the indexes
+        """
+        s_class = cls.__name__
+        values = INDEXED_VALUES.get(s_class, {}).pop(obj_id, None)
+        if values is None:
+            return
+        for attr, value in zip(cls.INDEXES, values):
+            bucket = HASH_INDEXES[s_class][attr][value]
+            del bucket[obj_id]
+            if not bucket:
+                del HASH_INDEXES[s_class][attr][value]
+        for attr, value in zip(cls.RANGE_INDEXES, values[len(cls.INDEXES):]):
+            keys = SORTED_INDEXES[s_class][attr]
+            del keys[bisect_left(keys, sort_key(value) + (obj_id,))]
+
+    @classmethod
+    def search(cls, attributes: dict = {}, ranges: dict = None,
+               order_by: str = None, reverse: bool = False,
+               limit: int = None) -> List[TypeVar('Base')]:
         """ Search all objects with matching attributes
+        ranges: {attribute: (start, end)}, objects with start <= value
+                < end, either bound can be None
+        order_by: attribute to sort the results by, in reverse order
+                  with reverse
+        limit: maximum number of objects returned
+
+        The planner reads candidates from the most selective index: the
+        smallest hash bucket of an equality or the smallest sorted slice
+        of a range. When order_by has a range index and nothing narrower
+        was found, candidates are read in order from it and the read
+        stops at the limit. Without usable index, every object is scanned.
         """
+        if cls.STORAGE is not None:
+            return cls.STORAGE.search(cls, attributes, ranges, order_by,
+                                      reverse, limit)
         s_class = cls.__name__
+        cls.refresh()
+        ranges = ranges or {}
+        bounds = {attr: (None if start is None else sort_key(start),
+                         None if end is None else sort_key(end))
+                  for attr, (start, end) in ranges.items()}
 
         def _search(obj):
-            if len(attributes) == 0:
-                return True
+            if obj is None:
+                return False
             for k, v in attributes.items():
                 if (getattr(obj, k) != v):
                     return False
+            for k, (start, end) in bounds.items():
+                value = sort_key(getattr(obj, k))
+                if not value[0] or (start is not None and value < start) \
+                        or (end is not None and value >= end):
+                    return False
             return True
 
-        return list(filter(_search, DATA[s_class].values()))
+        objs = DATA[s_class]
+        candidates = objs.values()
+        size = len(objs)
+        ordered_by = None
+        indexes = HASH_INDEXES.get(s_class, {})
+        for k, v in attributes.items():
+            if k not in indexes:
+                continue
+            try:
+                bucket = indexes[k].get(v, {})
+            except TypeError:
+                continue
+            if len(bucket) < size:
+                candidates, size = bucket.values(), len(bucket)
+
+        sorted_indexes = SORTED_INDEXES.get(s_class, {})
+        for k in sorted_indexes.keys() & (bounds.keys() | {order_by}):
+            keys = sorted_indexes[k]
+            start, end = bounds.get(k, (None, None))
+            lo = 0 if start is None else bisect_left(keys, start)
+            hi = len(keys) if end is None else bisect_left(keys, end)
+            if hi - lo < size or (k == order_by and hi - lo == size):
+                # with a limit, the index is read by windows from the
+                # limit up: only the keys the filter needs are copied
+                window = None if limit is None else max(limit, 1)
+                candidates = (objs.get(key[-1]) for key in iter_index(
+                    keys, start, end, reverse, window))
+                size, ordered_by = hi - lo, k
+
+        if ordered_by is None:
+            # snapshot of the dict view in one C call, which no write can
+            # interleave with
+            candidates = tuple(candidates)
+        result = filter(_search, candidates)
+        if order_by is not None and order_by != ordered_by:
+            result = sorted(result, reverse=reverse,
+                            key=lambda obj: sort_key(getattr(obj, order_by)))
+        return list(islice(result, limit))
+
+
+def flush_all():
+    """ Write the queued changes of every class
+    """
+    classes = [Base]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        if PENDING.get(cls.__name__):
+            cls.flush()
+
+
+atexit.register(flush_all)
@@ -8,6 +8,10 @@ from models.base import Base
 class User(Base):
     """ User class
     """
+    __slots__ = ('email', '_password', 'first_name', 'last_name')
+    INDEXES = ('email',)
+    RANGE_INDEXES = ('id', 'created_at', 'updated_at')
+    INTERNED = ('first_name', 'last_name')
 
     def __init__(self, *args: list, **kwargs: dict):
         """ Initialize a User instance
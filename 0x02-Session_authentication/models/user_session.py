@@ -8,6 +8,11 @@ from models.base import Base
 class UserSession(Base):
     """UserSession class
     """
+    __slots__ = ('user_id', 'session_id')
+    INDEXES = ('session_id', 'user_id')
+    RANGE_INDEXES = ('created_at',)
+    INTERNED = ('user_id',)
+
     def __init__(self, *args: list, **kwargs: dict):
         """ Constructor """
         super().__init__(*args, **kwargs)
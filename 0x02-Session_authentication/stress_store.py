@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+""" Stress test of the object store: writer threads save, update and
+remove users while reader threads search, list and serialize them,
+in one or several processes sharing the same files
+Fails if a thread raises, if a reader misses a user that is saved all
+along, or if memory, indexes and file disagree
+Usage: ./stress_store.py [threads] [seconds] [processes]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from models.base import HASH_INDEXES, SORTED_INDEXES
+from models.user import User
+
+
+def writer(stop: threading.Event, errors: list, survivors: dict,
+           stable: User):
+    """ Create, update and remove users, and re-save `stable`, until
+    stopped
+    The users still saved at the end are added to `survivors`
+    """
+    mine = []
+    try:
+        while not stop.is_set():
+            action = random.random()
+            if action < 0.1:
+                stable.first_name = str(random.randrange(50))
+                stable.save()
+            elif action < 0.5 or not mine:
+                user = User(email="{}@hbtn.io".format(random.randrange(50)))
+                user.save()
+                mine.append(user)
+            elif action < 0.8:
+                # a new version, not the saved object changed in place:
+                # readers holding the old version still see its email
+                i = random.randrange(len(mine))
+                mine[i] = User(**dict(mine[i].to_json(True), email="{}@hbtn.io"
+                                      .format(random.randrange(50))))
+                mine[i].save()
+            else:
+                mine.pop(random.randrange(len(mine))).remove()
+    except Exception as e:
+        errors.append(e)
+    survivors.update((user.id, user.email) for user in mine)
+
+
+def reader(stop: threading.Event, errors: list, survivors: dict,
+           stable: User):
+    """ Search, list and serialize users until stopped
+    `stable` is saved all along: every lookup must find it
+    """
+    try:
+        while not stop.is_set():
+            if [u.id for u in User.search({'email': stable.email})] != [
+                    stable.id]:
+                raise AssertionError("search missed an existing user")
+            if User.get(stable.id) is None:
+                raise AssertionError("get missed an existing user")
+            email = "{}@hbtn.io".format(random.randrange(50))
+            for user in User.search({'email': email}):
+                if user.email != email:
+                    raise AssertionError("search returned a wrong user")
+            users = User.search(order_by='id', limit=20)
+            if [u.id for u in users] != sorted(u.id for u in users):
+                raise AssertionError("order_by returned unsorted users")
+            for user in User.all():
+                user.to_json()
+            User.count()
+    except Exception as e:
+        errors.append(e)
+
+
+def run(threads: int, seconds: float) -> dict:
+    """ Run the reader and writer threads
+    Return the email of every user the writers left saved
+    """
+    random.seed()
+    sys.setswitchinterval(1e-5)
+    stop, errors, survivors = threading.Event(), [], {}
+    stable = User(email="stable{}@hbtn.io".format(os.getpid()))
+    stable.save()
+    survivors[stable.id] = stable.email
+    workers = [threading.Thread(target=writer if i % 2 else reader,
+                                args=(stop, errors, survivors, stable))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    time.sleep(seconds)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0]
+    return survivors
+
+
+def check_consistency(expected: dict):
+    """ Memory, indexes and file hold the users the writers left saved
+    """
+    User.load_from_file()
+    ids = {user.id: user.email for user in User.all()}
+    if ids != expected:
+        raise AssertionError("file out of sync")
+    emails = {obj_id: email for email, bucket in HASH_INDEXES['User'][
+        'email'].items() for obj_id in bucket}
+    if emails != ids:
+        raise AssertionError("email index out of sync")
+    if [key[-1] for key in SORTED_INDEXES['User']['id']] != sorted(ids):
+        raise AssertionError("id index out of sync")
+
+
+if __name__ == '__main__':
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else 1
+    os.chdir(tempfile.mkdtemp())
+    User.JOURNAL = True
+
+    expected = {}
+    try:
+        if processes == 1:
+            expected = run(threads, seconds)
+        else:
+            context = multiprocessing.get_context('fork')
+            with context.Pool(processes) as pool:
+                for survivors in pool.starmap(run, [(threads, seconds)] *
+                                              processes):
+                    expected.update(survivors)
+        check_consistency(expected)
+    except Exception as e:
+        print("FAIL: {!r}".format(e))
+        sys.exit(1)
+    print("OK: {} processes of {} threads, {} users".format(
+        processes, threads, len(expected)))